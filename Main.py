@@ -1,47 +1,278 @@
 import os
 import sys
 import json
+import time
+import traceback
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), 'src')))
 
-def Execute_LTROI(config: dict):
+DATE_KEYS = ["date_format", "model_start_date", "model_end_date"]
+DTYPE_KEYS = ["categorical_dimensions", "float32_measures"]
+OUTPUT_DIRS = ['ensemble_results', 'Extrapolated Data', 'Weekly ROI Format', 'Weighted Cost', 'logs']
+
+
+def Execute_LTROI(config: dict, from_stage: str = None, until_stage: str = None, resume: bool = False):
     Weekly_Imp = config["input_files"]["Weekly_Imp"]
     Daily_cost = config["input_files"]["Daily_cost"]
     Daily_Impression = config["input_files"]["Daily_Impression"]
     Model_A_Raw_Abs = config["input_files"]["Model_A_Raw_Abs"]
     lagged_files_path = config["lagged_files"]
+    brand = config["brand"]
+    metrics = list(config.get("metrics", []))
 
+    # Stages hand their DataFrames to each other through the run context;
+    # intermediates are only written (Parquet by default) when explicitly requested.
+    # Relative input/output paths resolve under the run's workspace root ("." by default).
+    from src.artifact_store import get_artifact_store
+    from src.dtype_policy import get_dtype_policy
+    from src.run_context import RunContext
+    from src.workspace import get_workspace
+    workspace = get_workspace(config)
+    if config.get("workspace_root"):
+        workspace.makedirs()
+    context = RunContext(
+        export_intermediates=config.get("export_intermediates", False),
+        store=get_artifact_store(config.get("artifact_format", "parquet")),
+        dtype_policy=get_dtype_policy(config),
+        workspace=workspace,
+    )
 
     from src.daily_ratio_weekly_sales_0 import process_sales_data
-    process_sales_data(config)
-
     from src.data_ingestion_1 import data_ingestion
-    data_ingestion(Weekly_Imp, Daily_cost, lagged_files_path, Daily_Impression, Model_A_Raw_Abs, config)
-
     from src.MDS_Sales_Generation_2 import mds_sales_and_units_generation
-    mds_sales_and_units_generation(config)
-
     from src.Weekly_Sales_on_Model_A_3 import weekly_sales
-    weekly_sales(config)
-
     from src.Weekly_ROI_Results_4 import weekly_results
-    weekly_results(config)
-
     from src.Extrapolated_weighted_ROI_5 import LTROI_RROI
-    LTROI_RROI(config)
-
     from src.Monthly_Expected_Sales_6 import generate_expected_sales
-    generate_expected_sales(config)
-
     from src.Monthly_Expected_Sales_Renaming_7 import process_expected_sales
-    process_expected_sales(config)
-
     from src.STROI_8_Part1 import STROI
-    STROI(config)
-
     from src.STROI_8_Part2 import finalize_rroi
-    finalize_rroi(config)
 
-    return {"status": "Pipeline executed successfully"}
+    weekly_results_keys = ["brand", "metrics", "pure_baseline", "roi_base_metric", "expected_sales_start",
+                           "ProductLine_Flag"] + DATE_KEYS
+    ensemble_files = [
+        f"{config['modelA_s3_folder_path']}/raw_abs_{brand}_{model}.csv"
+        for metric in metrics for model in config.get(metric, [])
+    ]
+
+    kpis = list(config.get("kpi", {}))
+    ingested_roles = ["Impressions_unlagged", "Daily_Cost", "Daily_Impressions"] + [
+        role for metric in metrics for role in (f"Impressions_lagged_{metric}", f"raw_abs_{metric}_ensemble")
+    ]
+
+    # The pipeline as a graph: each stage names the stages it reads from, the
+    # config keys and raw files it depends on and the artifacts it hands on
+    # (a path, or a (workbook path, sheet) pair).
+    from src.input_catalog import catalog_path
+    from src.stage_graph import Stage, check_graph, critical_path, run_graph, select_stages
+    stages = [
+        Stage("process_sales_data", lambda: process_sales_data(config, context), [],
+              ["brand", "act_model_start", "off_units_col", "Daily_Units_and_sales"] + DATE_KEYS,
+              [config["input_files"].get("STROI"), config["input_files"].get("Daily_Units_and_sales")],
+              [f"./input/Data/{brand}_weekly {kpi}.xlsx" for kpi in kpis] + [f"./input/Data/{brand}_daily_ratio_for_lt.xlsx"]),
+        Stage("data_ingestion", lambda: data_ingestion(Weekly_Imp, Daily_cost, lagged_files_path, Daily_Impression, Model_A_Raw_Abs, config, context), [],
+              ["brand", "metrics", "excel_engine"],
+              [Weekly_Imp, Daily_cost, Daily_Impression, Model_A_Raw_Abs] + list(lagged_files_path),
+              [catalog_path(brand, role) for role in ingested_roles]),
+        Stage("mds_sales_and_units_generation", lambda: mds_sales_and_units_generation(config, context), ["process_sales_data"],
+              ["brand", "kpi", "metrics"] + DATE_KEYS,
+              [config["input_files"].get("modelB_raw_abs")],
+              [f"./input/Data/mds_{kpi}.xlsx" for kpi in kpis]),
+        Stage("weekly_sales", lambda: weekly_sales(config, context), ["mds_sales_and_units_generation", "data_ingestion"],
+              ["brand", "kpi", "metrics", "modelA_s3_folder_path", "ensemble_weights"] + metrics + DATE_KEYS,
+              ensemble_files,
+              [(f"./input/Data/LTROI {brand} Weekly {metric}.xlsx", f"Weekly {kpi}") for metric in metrics for kpi in kpis]),
+        Stage("weekly_results", lambda: weekly_results(config, context), ["data_ingestion", "mds_sales_and_units_generation", "weekly_sales"],
+              weekly_results_keys, [],
+              [f"./output/Weekly ROI Format/{brand}_{metric}_Weekly_results.xlsx" for metric in metrics + ["Pure_Baseline"]]),
+        Stage("LTROI_RROI", lambda: LTROI_RROI(config, context), ["weekly_results"],
+              ["brand", "metrics", "baseline_key", "expected_sales_start", "ProductLine_Flag", "expected_sales_media_type"] + DATE_KEYS,
+              [f"./input/Data/{brand}_lag_file.xlsx"],
+              [f"./output/Extrapolated Data/LTROI_{brand}_rroi_{metric}.xlsx" for metric in metrics]),
+        Stage("generate_expected_sales", lambda: generate_expected_sales(config, context), ["process_sales_data", "weekly_results", "LTROI_RROI"],
+              ["brand", "metrics", "expected_sales_start", "model_end_date"], [],
+              [f"./output/Extrapolated Data/monthly_expected_sales_{brand}_{metric}.xlsx" for metric in metrics + ["Pure_Baseline"]]),
+        Stage("process_expected_sales", lambda: process_expected_sales(config, context), ["generate_expected_sales"],
+              ["brand", "metrics", "ProductLine_Flag", "ProductLine"], [],
+              [f"./output/Extrapolated Data/Only_LT_lt_rroi_{brand}.xlsx"]),
+        Stage("STROI", lambda: STROI(config, context), ["process_expected_sales"],
+              ["brand", "kpi", "expected_sales_start", "ProductLine_Flag", "media_cost_imp_from_daily_files",
+               "cost_imp_to_exclude_from_st_rroi"] + DATE_KEYS,
+              ["./input/Data/ST ROI.xlsx"],
+              [f"./output/ensemble_results/final_rroi_{brand}_edited.xlsx"]),
+        Stage("finalize_rroi", lambda: finalize_rroi(config, context), ["STROI", "data_ingestion"],
+              ["brand", "ProductLine_Flag", "curr_date", "ProductLine", "kpi_name", "media_cost_imp_from_daily_files",
+               "cost_imp_source"] + DATE_KEYS, [], cacheable=False),
+    ]
+    check_graph(stages)
+    selected = select_stages(stages, from_stage or config.get("from_stage"), until_stage or config.get("until_stage"))
+
+    cache = None
+    if config.get("stage_cache", False):
+        from src.stage_cache import StageCache
+        cache = StageCache(workspace.path(config.get("stage_cache_dir", "./output/stage_cache")))
+
+    # With checkpoints (or on resume) every successful stage is checkpointed; a
+    # resumed run restores the stages whose checkpoint still matches (and whose
+    # upstream stages were restored too) and runs from the first failed or
+    # invalidated stage on.
+    resume = resume or config.get("resume", False)
+    checkpoints = None
+    if config.get("checkpoint", False) or resume:
+        from src.checkpoint import Checkpoints
+        checkpoints = Checkpoints(workspace.path(config.get("checkpoint_dir", "./output/checkpoints")))
+        for stage in stages:
+            input_files = [workspace.path(path) for path in stage.input_files]
+            checkpoints.fingerprint(stage.name, config, stage.config_keys + DTYPE_KEYS, input_files, stage.upstream)
+
+    restored = []
+    if resume:
+        # stages that write files always rerun: the deliverable, and every stage
+        # when intermediates are exported (as with the stage cache)
+        for stage in stages:
+            if stage.cacheable and not context.export_intermediates and all(up in restored for up in stage.upstream) and checkpoints.restore(stage.name, context):
+                restored.append(stage.name)
+        print(f"Resuming with {len(restored)} stages restored from checkpoints: {restored}")
+    to_run = [name for name in selected if name not in restored]
+
+    from src.run_report import RunReport
+    from src.run_context import has_artifact
+    report = RunReport(context, config, planned=to_run)
+
+    # Stages left out of a partial run are taken from the stage cache when it
+    # holds them, otherwise the outputs the run reads must be on disk from an
+    # earlier run (with export_intermediates).
+    needed = {up for stage in stages if stage.name in to_run for up in stage.upstream}
+    for stage in stages:
+        if stage.name in selected or stage.name in restored:
+            continue
+        input_files = [workspace.path(path) for path in stage.input_files]
+        if cache is not None and cache.restore(stage.name, context, config, stage.config_keys + DTYPE_KEYS, input_files, stage.upstream):
+            continue
+        missing = [
+            output for output in stage.outputs
+            if not has_artifact(context, *(output if isinstance(output, tuple) else (output,)))
+        ] if stage.name in needed else []
+        if missing:
+            raise FileNotFoundError(f"Stage {stage.name} is not part of this run and its outputs are missing: {missing}")
+
+    def run_stage(stage):
+        input_files = [workspace.path(path) for path in stage.input_files]
+        try:
+            with report.stage(stage.name, input_files) as entry:
+                if cache is None:
+                    stage.run()
+                else:
+                    # a cache hit skips the files a stage writes, so those that must write them always run
+                    reuse = stage.cacheable and not context.export_intermediates
+                    cache.run(stage.name, stage.run, context, config, stage.config_keys + DTYPE_KEYS, input_files, stage.upstream, reuse)
+                    entry["cache"] = cache.status[stage.name]
+        except Exception:
+            if checkpoints is not None:
+                checkpoints.drop(stage.name)
+            raise
+        if checkpoints is not None:
+            # fingerprinted again: an upstream stage may have exported over one of its input files
+            checkpoints.fingerprint(stage.name, config, stage.config_keys + DTYPE_KEYS, input_files, stage.upstream)
+            checkpoints.save(stage.name, context.produced({}, stage.name))
+
+    try:
+        run_graph(stages, run_stage, config.get("stage_workers", 1) or 1, to_run)
+    finally:
+        path = critical_path([stage for stage in stages if stage.name in to_run], {s["stage"]: s["wall_s"] for s in report.stages})
+        print(f"Critical path: {' -> '.join(path['stages'])} ({path['wall_s']}s)")
+        run_report = report.finish(workspace.path(config.get("run_report_path", "./output/logs/run_report.json")), path)
+
+    result = {"status": "Pipeline executed successfully"}
+    if cache is not None:
+        result["stages"] = dict(cache.status)
+    if resume:
+        result["resumed"] = restored
+    result["run_report"] = run_report
+    return result
+
+
+def _run_brand(config: dict, workdir: str):
+    """Run one brand inside its own working directory (in a fresh worker process)."""
+    started = time.time()
+    report = {"brand": config.get("brand"), "workdir": workdir, "status": "failed", "error": None}
+    try:
+        os.chdir(workdir)
+        os.makedirs("./input/Data", exist_ok=True)
+        for path in OUTPUT_DIRS:
+            os.makedirs(f"./output/{path}", exist_ok=True)
+        result = Execute_LTROI(config)
+        report["status"] = "success"
+        if "stages" in result:
+            report["stages"] = result["stages"]
+        report["run_report"] = result.get("run_report")
+    except Exception as e:
+        report["error"] = f"{type(e).__name__}: {e}"
+        report["traceback"] = traceback.format_exc()
+    report["seconds"] = round(time.time() - started, 2)
+    return report
+
+
+def Execute_Batch(configs: list, batch_dir: str = "./brands", max_workers: int = None):
+    """Run several brand configs across a process pool.
+
+    Every brand runs in its own working directory, `config["workdir"]` or
+    `{batch_dir}/{brand}`, holding that brand's `input/` tree; the pipeline's
+    relative `./input/Data` and `./output` paths therefore resolve per brand.
+    Each brand gets a fresh worker process so its logs land in its own
+    `output/logs`. A consolidated report is written to `{batch_dir}/batch_report.json`.
+    """
+    batch_dir = os.path.abspath(batch_dir)
+    os.makedirs(batch_dir, exist_ok=True)
+    workdirs = [
+        os.path.abspath(config.get("workdir") or os.path.join(batch_dir, config["brand"]))
+        for config in configs
+    ]
+    started_at = datetime.now().isoformat(timespec="seconds")
+    started = time.time()
+
+    brands = []
+    with ProcessPoolExecutor(max_workers=max_workers, max_tasks_per_child=1) as pool:
+        futures = [pool.submit(_run_brand, config, workdir) for config, workdir in zip(configs, workdirs)]
+        for config, workdir, future in zip(configs, workdirs, futures):
+            try:
+                brands.append(future.result())
+            except Exception as e:
+                brands.append({"brand": config.get("brand"), "workdir": workdir, "status": "failed",
+                               "error": f"{type(e).__name__}: {e}", "seconds": None})
+
+    report = {
+        "started_at": started_at,
+        "seconds": round(time.time() - started, 2),
+        "succeeded": sum(b["status"] == "success" for b in brands),
+        "failed": sum(b["status"] != "success" for b in brands),
+        "brands": brands,
+    }
+    report_path = os.path.join(batch_dir, "batch_report.json")
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=4)
+
+    for b in brands:
+        seconds = "-" if b["seconds"] is None else f"{b['seconds']}s"
+        print(f"{b['brand']:<12} {b['status']:<8} {seconds:>10} {b['error'] or ''}")
+    print(f"{report['succeeded']} succeeded, {report['failed']} failed in {report['seconds']}s. Report: {report_path}")
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the LT ROI pipeline for one config")
+    parser.add_argument("config", nargs="?", default="./input/Config/config.json")
+    parser.add_argument("--from", dest="from_stage", help="start at this stage (and run everything downstream of it)")
+    parser.add_argument("--until", dest="until_stage", help="stop after this stage (and what it depends on)")
+    parser.add_argument("--resume", action="store_true", help="reuse the checkpoints of the last run, from the first failed stage on")
+    args = parser.parse_args()
 
+    with open(args.config, "r") as f:
+        config = json.load(f)
+    result = Execute_LTROI(config, args.from_stage, args.until_stage, args.resume)
+    print(result["status"])
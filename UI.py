@@ -9,6 +9,7 @@ from io import StringIO
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__),)))
 from Main import Execute_LTROI
+from src.workspace import Workspace
 
 
 config_data_path = Path("./input/Config")
@@ -25,6 +26,11 @@ path_lst = ['ensemble_results', 'Extrapolated Data', 'Weekly ROI Format', 'Weigh
 for path in path_lst:
     os.makedirs(f"./output/{path}", exist_ok=True)
 
+# every browser session runs in its own workspace ./runs/{run_id}, sharing ./input
+if "workspace" not in st.session_state:
+    st.session_state["workspace"] = Workspace.for_run("./runs").link_input("./input")
+workspace = st.session_state["workspace"]
+
 st.title("LT RROI")
 
 uploaded_config = st.file_uploader("Upload your config.json file", type=["json"])
@@ -50,6 +56,10 @@ if uploaded_config is not None:
         selected_brand = st.selectbox("Choose a brand", brand_list)
 
         config["brand"] = selected_brand
+        config["workspace_root"] = workspace.root
+        config["run_id"] = workspace.run_id
+        # uploads below land in the shared ./input; the run links them into its workspace
+        config["shared_input_dir"] = "./input"
 
         today_date = datetime.today().strftime("%d-%m-%Y")
         config["curr_date"] = today_date
@@ -103,6 +113,7 @@ if uploaded_config is not None:
                 result = Execute_LTROI(config)
 
                 st.success(result.get("status", "Pipeline finished"))
+                st.write(f"Outputs written to: {workspace.path('./output')}")
                 st.json(config)
 
             except Exception as e:
@@ -1,11 +1,74 @@
-from fastapi import FastAPI, UploadFile, File
+import os
+from typing import List
+from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi.responses import FileResponse
+from starlette.concurrency import run_in_threadpool
 import json
-from Main import Execute_LTROI
+from Main import Execute_Batch
+from jobs import JobManager
 
 app = FastAPI()
 
+# Pipelines run in this many worker processes; further jobs wait in the queue
+jobs = JobManager(
+    jobs_dir=os.environ.get("LTROI_JOBS_DIR", "./jobs"),
+    max_workers=int(os.environ.get("LTROI_JOB_WORKERS", 2)),
+)
+
+
+@app.on_event("shutdown")
+def shutdown_jobs():
+    jobs.shutdown()
+
+
 @app.post("/run/")
 async def run_pipeline(config_file: UploadFile = File(...)):
     config = json.loads(await config_file.read())
-    result = Execute_LTROI(config)
+    # own workdir per call, so concurrent runs never share output/ or progress files
+    job_id = jobs.submit(config)
+    report = await jobs.wait(job_id)
+    if report["status"] != "success":
+        raise HTTPException(status_code=500, detail=report["error"])
+    result = {"status": "Pipeline executed successfully", "job_id": job_id}
+    if "stages" in report:
+        result["stages"] = report["stages"]
+    result["run_report"] = report["run_report"]
     return result
+
+
+@app.post("/run_batch/")
+async def run_batch(config_files: List[UploadFile] = File(...)):
+    configs = [json.loads(await config_file.read()) for config_file in config_files]
+    result = await run_in_threadpool(Execute_Batch, configs)
+    return result
+
+
+@app.post("/jobs")
+async def submit_job(config_file: UploadFile = File(...)):
+    config = json.loads(await config_file.read())
+    job_id = jobs.submit(config)
+    return {"job_id": job_id, "status": "queued"}
+
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    status = jobs.status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job {job_id}")
+    return status
+
+
+@app.get("/jobs/{job_id}/artifacts")
+async def job_artifacts(job_id: str):
+    status = jobs.status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job {job_id}")
+    return {"job_id": job_id, "status": status["status"], "artifacts": jobs.artifacts(job_id)}
+
+
+@app.get("/jobs/{job_id}/artifacts/{name:path}")
+async def job_artifact(job_id: str, name: str):
+    path = jobs.artifact_path(job_id, name)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"No artifact {name} for job {job_id}")
+    return FileResponse(path, filename=os.path.basename(path))
@@ -0,0 +1,83 @@
+import os
+import sys
+import json
+import argparse
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Main import Execute_Batch
+from synthetic_data import generate
+
+# name: (granularities, weeks, metrics, ensemble members)
+SCALE_POINTS = {
+    "small": (11, 104, 3, 2),
+    "medium": (50, 156, 3, 3),
+    "large": (200, 260, 5, 4),
+}
+
+
+def run_benchmarks(out_dir="./benchmarks/results", scales=("small", "medium"), config_overrides=None, seed=0):
+    """Generate each scale point, run the full pipeline on it and collect per-stage timings.
+
+    Scale points run one at a time (each in a fresh process and its own
+    working directory) so timings do not compete for cores.
+    """
+    out_dir = os.path.abspath(out_dir)
+    configs = []
+    for scale in scales:
+        no_of_granularities, no_of_weeks, no_of_metrics, members = SCALE_POINTS[scale]
+        workdir = os.path.join(out_dir, scale)
+        config = generate(workdir, no_of_granularities, no_of_weeks, no_of_metrics, members, seed=seed)
+        config.update(config_overrides or {})
+        config["workdir"] = workdir
+        configs.append(config)
+        print(f"Generated {scale}: {no_of_granularities} granularities, {no_of_weeks} weeks, "
+              f"{no_of_metrics} metrics, {members} ensemble members")
+
+    batch = Execute_Batch(configs, batch_dir=out_dir, max_workers=1)
+
+    results = {}
+    for scale, brand in zip(scales, batch["brands"]):
+        run_report = brand.get("run_report") or {}
+        results[scale] = {
+            "parameters": dict(zip(["granularities", "weeks", "metrics", "ensemble_members"], SCALE_POINTS[scale])),
+            "status": brand["status"],
+            "error": brand["error"],
+            "wall_s": run_report.get("wall_s"),
+            "peak_rss_mb": run_report.get("peak_rss_mb"),
+            "stages": {s["stage"]: {"wall_s": s["wall_s"], "cpu_s": s["cpu_s"]} for s in run_report.get("stages", [])},
+        }
+
+    results_path = os.path.join(out_dir, "benchmark_results.json")
+    with open(results_path, "w") as f:
+        json.dump(results, f, indent=4)
+    print(f"Benchmark results written to {results_path}")
+    return results
+
+
+def compare(results, baseline):
+    """Print per-stage wall time against a baseline results file (ratio > 1 is slower)."""
+    for scale, result in results.items():
+        if scale not in baseline:
+            continue
+        print(f"\n{scale}: {result['wall_s']}s vs {baseline[scale]['wall_s']}s")
+        for stage, timing in result["stages"].items():
+            base = baseline[scale]["stages"].get(stage)
+            if not base:
+                continue
+            ratio = timing["wall_s"] / base["wall_s"] if base["wall_s"] else float("nan")
+            print(f"  {stage:<32} {timing['wall_s']:>9.3f}s {base['wall_s']:>9.3f}s  x{ratio:.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time each Execute_LTROI stage on synthetic data")
+    parser.add_argument("--out", default="./benchmarks/results")
+    parser.add_argument("--scales", nargs="+", default=["small", "medium"], choices=list(SCALE_POINTS))
+    parser.add_argument("--baseline", help="benchmark_results.json of an earlier run to compare against")
+    parser.add_argument("--config", help="JSON object of config overrides, e.g. '{\"max_workers\": 4}'")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.out, args.scales, json.loads(args.config) if args.config else None)
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(results, json.load(f))
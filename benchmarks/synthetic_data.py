@@ -0,0 +1,195 @@
+import os
+import json
+import argparse
+
+import numpy as np
+import pandas as pd
+
+GRANULARITY_COLS = ["Media Type", "Product Line", "Master Channel", "Channel", "Platform"]
+BASE_METRICS = ["MFI", "DFI", "SFI"]
+BASE_GRANULARITIES = [
+    ("Paid Media", "{brand}", "TV", "Linear TV", "National"),
+    ("Paid Media", "{brand}", "Digital", "Digital Video", "YouTube"),
+    ("Paid Media", "{brand}", "Digital", "Social", "Meta"),
+    ("Earned Media", "{brand}", "PR", "PR", None),
+    ("Halo", "Masterbrand", "TV", "Linear TV", "National"),
+]
+
+
+def metric_names(no_of_metrics):
+    """MFI, DFI, SFI, then K04FI, K05FI, ... (zero padded so lagged-file matching stays unique)."""
+    extra = [f"K{i:02d}FI" for i in range(len(BASE_METRICS) + 1, no_of_metrics + 1)]
+    return (BASE_METRICS + extra)[:no_of_metrics]
+
+
+def granularities(no_of_granularities, brand):
+    grans = [tuple(brand if g == "{brand}" else g for g in gran) for gran in BASE_GRANULARITIES]
+    for k in range(max(no_of_granularities - len(grans), 0)):
+        grans.append(("Owned Media", brand, "Owned", f"Chan{k}", f"Plat{k}"))
+    return grans[:no_of_granularities]
+
+
+def generate(root, no_of_granularities=11, no_of_weeks=156, no_of_metrics=3, ensemble_members=2,
+             brand="Vaseline", seed=0):
+    """Write a complete synthetic input tree plus config.json under `root`.
+
+    Produces every file in the README input table: weekly and daily
+    impressions, daily cost, one lagged impression file per metric, the
+    Model A raw ABS workbook (one sheet per metric), extra Model A ensemble
+    members as raw_abs CSVs, the Model B raw ABS file, the brand lag file,
+    STROI (ROI Format / Monthly Base Sales) and daily units and sales.
+    Returns the config.
+    """
+    if ensemble_members < 2:
+        raise ValueError("ensemble_members must be at least 2")
+
+    rng = np.random.default_rng(seed)
+    for folder in ["Data", "lagged_files", "raw attribution", "Config"]:
+        os.makedirs(f"{root}/input/{folder}", exist_ok=True)
+
+    metrics = metric_names(no_of_metrics)
+    grans = granularities(no_of_granularities, brand)
+    gran_names = ["|".join(g for g in gran if g is not None) for gran in grans]
+
+    model_start = pd.Timestamp("2021-07-01")
+    weekly = pd.date_range(model_start, periods=no_of_weeks, freq="W")
+    model_end = weekly[-1]
+    daily = pd.date_range(model_start, model_end, freq="D")
+    expected_sales_start = model_start - pd.Timedelta(weeks=26)
+
+    def wide(dates, suffix, scale):
+        data = {"Date": dates}
+        for name in gran_names:
+            data[f"{name}|{suffix}"] = rng.uniform(0, scale, len(dates)).round(3)
+        return pd.DataFrame(data)
+
+    data_dir = f"{root}/input/Data"
+    wide(weekly, "Impressions", 1e5).to_excel(f"{data_dir}/weekly_impressions.xlsx", index=False)
+    wide(daily, "Cost", 1e3).to_excel(f"{data_dir}/daily_cost.xlsx", index=False)
+    wide(daily, "Impressions", 1e4).to_excel(f"{data_dir}/daily_impressions.xlsx", index=False)
+
+    lagged_files = []
+    for metric in metrics:
+        path = f"./input/lagged_files/{metric}_Lagged_Impression.xlsx"
+        wide(weekly, "Impressions", 1e5).to_excel(f"{root}/{path}", index=False)
+        lagged_files.append(path)
+
+    # Model A: one sheet per metric, further ensemble members as raw_abs CSVs
+    def model_a():
+        data = {"Date": weekly}
+        for name in gran_names:
+            data[f"{name}|x|effect_essence"] = rng.uniform(0.1, 1, len(weekly)).round(4)
+        return pd.DataFrame(data)
+
+    members = {}
+    with pd.ExcelWriter(f"{data_dir}/model_a_raw_abs.xlsx") as writer:
+        for metric in metrics:
+            model_a().to_excel(writer, sheet_name=metric, index=False)
+            members[metric] = [f"{metric}_ensemble"]
+            for k in range(1, ensemble_members):
+                member = f"{metric}_m{k}"
+                df_member = model_a()
+                df_member["Date"] = df_member["Date"].dt.strftime("%Y-%m-%d")
+                df_member.to_csv(f"{root}/input/raw attribution/raw_abs_{brand}_{member}.csv", index=False)
+                members[metric].append(member)
+
+    model_b = pd.DataFrame({"Date": weekly, "Year": weekly.year, "Week": weekly.isocalendar().week.values})
+    for metric in metrics + ["Pure_Baseline"]:
+        model_b[metric] = rng.uniform(0.1, 1, len(weekly)).round(4)
+    model_b.to_excel(f"{data_dir}/model_b_raw_abs.xlsx", index=False)
+
+    # Lag file: attributes are rows, one column per granularity
+    labels = GRANULARITY_COLS + ["Lag", "Decay"]
+    for metric in metrics:
+        labels += [f"{metric} Alpha", f"{metric} Beta", f"{metric} Lag", f"{metric} Decay"]
+    lag = {"Label": labels, "Description": ["-"] * len(labels)}
+    for i, gran in enumerate(grans):
+        column = list(gran) + ["-", "-"]
+        for _ in metrics:
+            column += [round(float(rng.uniform(0.85, 0.97)), 4), round(float(rng.uniform(0.2, 0.8)), 4), "-", "-"]
+        lag[f"Feature {i}"] = column
+    with pd.ExcelWriter(f"{data_dir}/{brand}_lag_file.xlsx") as writer:
+        pd.DataFrame(lag).to_excel(writer, sheet_name="Lag File", index=False)
+
+    # STROI: monthly ROI format per granularity plus baseline, and monthly base sales
+    months = pd.period_range(expected_sales_start, model_end, freq="M")
+    rows = []
+    for period in months:
+        for gran in grans:
+            rows.append({**dict(zip(GRANULARITY_COLS, gran)), "Year": period.year, "Month": period.month,
+                         "Cost": float(rng.uniform(0, 1e4)), "Impression": float(rng.uniform(0, 1e6)),
+                         "Overall Dollar Sales": float(rng.uniform(0, 1e5)), "Overall Units": float(rng.uniform(0, 1e4))})
+        rows.append({"Media Type": "Baseline", "Year": period.year, "Month": period.month, "Cost": 0.0, "Impression": 0.0,
+                     "Overall Dollar Sales": float(rng.uniform(1e5, 1e6)), "Overall Units": float(rng.uniform(1e4, 1e5))})
+    roi_format = pd.DataFrame(rows)
+    monthly_base = pd.DataFrame({
+        "Year": [p.year for p in months], "Month": [p.month for p in months],
+        "Baseline Units": rng.uniform(1e4, 1e5, len(months)),
+        "Baseline Dollar Sales": rng.uniform(1e5, 1e6, len(months)),
+    })
+    for path in [f"{data_dir}/ST ROI.xlsx", f"{data_dir}/{brand}_STROI.xlsx"]:
+        with pd.ExcelWriter(path) as writer:
+            roi_format.to_excel(writer, sheet_name="ROI Format", index=False)
+            monthly_base.to_excel(writer, sheet_name="Monthly Base Sales", index=False)
+
+    off_units_col = f"{brand}|Offline|Units"
+    pd.DataFrame({
+        "Date": daily.strftime("%Y-%m-%d"),
+        "Year-Month": [f"{d.year}-{d.month}" for d in daily],
+        off_units_col: rng.uniform(10, 100, len(daily)).round(2),
+    }).to_csv(f"{data_dir}/daily_units_and_sales.csv", index=False)
+
+    config = {
+        "kpi": {
+            "Units": {"offline": "Offline Units", "online": "Online Units"},
+            "Dollar Sales": {"offline": "Offline Revenue", "online": "Online Revenue"},
+        },
+        "brand": brand,
+        "curr_date": "01-01-2025",
+        "ProductLine_Flag": 1,
+        "ProductLine": True,
+        "date_format": "%Y-%m-%d",
+        "media_cost_imp_from_daily_files": {"daily_imp": True, "daily_cost": True},
+        "metrics": metrics,
+        "cost_imp_to_exclude_from_st_rroi": {
+            "daily_imp": {"cond1": {"Media Type": "Paid Media"}, "cond2": {"Media Type": "Halo"}},
+            "daily_cost": {"cond1": {"Media Type": "Paid Media"}, "cond2": {"Media Type": "Halo"}},
+        },
+        "model_start_date": model_start.strftime("%Y-%m-%d"),
+        "act_model_start": weekly[0].strftime("%Y-%m-%d"),
+        "model_end_date": model_end.strftime("%Y-%m-%d"),
+        "expected_sales_start": expected_sales_start.strftime("%Y-%m-%d"),
+        "expected_sales_media_type": ["Paid Media", "Earned Media", "Halo", "Masterbrand", "Owned Media"],
+        **members,
+        "input_files": {
+            "Weekly_Imp": "./input/Data/weekly_impressions.xlsx",
+            "Daily_cost": "./input/Data/daily_cost.xlsx",
+            "Daily_Impression": "./input/Data/daily_impressions.xlsx",
+            "STROI": f"./input/Data/{brand}_STROI.xlsx",
+            "Daily_Units_and_sales": "./input/Data/daily_units_and_sales.csv",
+            "lag_file_path": f"./input/Data/{brand}_lag_file.xlsx",
+            "Model_A_Raw_Abs": "./input/Data/model_a_raw_abs.xlsx",
+            "modelB_raw_abs": "./input/Data/model_b_raw_abs.xlsx",
+        },
+        "lagged_files": lagged_files,
+        "modelA_s3_folder_path": "./input/raw attribution",
+        "pure_baseline": {"Dollar Sales": "Weekly Dollar Sales", "Units": "Weekly Units"},
+        "baseline_key": "Pure_Baseline",
+        "roi_base_metric": "Weekly Dollar Sales",
+        "off_units_col": off_units_col,
+    }
+    with open(f"{root}/input/Config/config.json", "w") as f:
+        json.dump(config, f, indent=4)
+    return config
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic LT-ROI input tree")
+    parser.add_argument("root")
+    parser.add_argument("--granularities", type=int, default=11)
+    parser.add_argument("--weeks", type=int, default=156)
+    parser.add_argument("--metrics", type=int, default=3)
+    parser.add_argument("--members", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    generate(args.root, args.granularities, args.weeks, args.metrics, args.members, seed=args.seed)
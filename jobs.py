@@ -0,0 +1,144 @@
+import os
+import json
+import uuid
+import asyncio
+import threading
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+from Main import _run_brand
+from src.workspace import Workspace
+
+PROGRESS_PATH = "./output/logs/progress.json"
+
+
+def _run_job(config, workdir, started_path):
+    """`_run_brand` that first records when the worker actually picked the job up."""
+    os.makedirs(os.path.dirname(started_path), exist_ok=True)
+    with open(started_path, "w") as f:
+        f.write(datetime.now().isoformat(timespec="seconds"))
+    return _run_brand(config, workdir)
+
+
+class JobManager:
+    """Queue of pipeline runs executed by a bounded pool of worker processes.
+
+    Every job gets an ID and, unless its config names a `workdir`, its own
+    working directory `{jobs_dir}/{job_id}` whose `input` links to the shared
+    `input_dir`, so concurrent jobs never write into each other's `output`.
+    Each run takes a fresh worker process (its logs and cwd stay its own) and
+    writes per-stage progress to `output/logs/progress.json` as it goes.
+
+    Jobs are kept in memory; beyond `max_finished` finished jobs the oldest
+    are forgotten (their workdirs stay on disk).
+    """
+
+    def __init__(self, jobs_dir="./jobs", max_workers=2, input_dir="./input", max_finished=1000):
+        self.jobs_dir = os.path.abspath(jobs_dir)
+        self.input_dir = os.path.abspath(input_dir)
+        self.max_workers = max_workers
+        self.max_finished = max_finished
+        self.jobs = {}
+        self._pool = None
+        self._lock = threading.Lock()
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers, max_tasks_per_child=1)
+        return self._pool
+
+    def submit(self, config, workdir=None):
+        """Queue a run of `config` and return its job ID straight away."""
+        job_id = uuid.uuid4().hex[:12]
+        workdir = os.path.abspath(workdir or config.get("workdir") or os.path.join(self.jobs_dir, job_id))
+        config = dict(config, progress_path=PROGRESS_PATH)
+        if not os.path.exists(workdir):
+            Workspace(workdir).link_input(self.input_dir)
+            # files added to the shared input while the job is queued are linked when it starts
+            config["shared_input_dir"] = os.path.abspath(self.input_dir)
+        # the pool hands calls to its workers ahead of time, so a job counts as
+        # running only once the worker wrote this marker
+        started_path = os.path.join(self.jobs_dir, "started", job_id)
+        with self._lock:
+            self._forget_finished()
+            self.jobs[job_id] = {
+                "job_id": job_id,
+                "brand": config.get("brand"),
+                "workdir": workdir,
+                "submitted_at": datetime.now().isoformat(timespec="seconds"),
+                "started_path": started_path,
+                "future": self.pool.submit(_run_job, config, workdir, started_path),
+            }
+        return job_id
+
+    def _forget_finished(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job["future"].done()]
+        for job_id in finished[:max(len(finished) - self.max_finished, 0)]:
+            job = self.jobs.pop(job_id)
+            if os.path.exists(job["started_path"]):
+                os.remove(job["started_path"])
+
+    async def wait(self, job_id):
+        """Await the job's brand report without blocking the event loop."""
+        return await asyncio.wrap_future(self.jobs[job_id]["future"])
+
+    def status(self, job_id):
+        """Job state (queued, running, succeeded or failed) with per-stage progress; None for an unknown ID."""
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+
+        future = job["future"]
+        status = {k: v for k, v in job.items() if k not in ("future", "started_path")}
+        if os.path.exists(job["started_path"]):
+            with open(job["started_path"]) as f:
+                status["started_at"] = f.read()
+        if not future.done():
+            status["status"] = "running" if "started_at" in status else "queued"
+        elif future.exception() is not None:
+            status["status"] = "failed"
+            status["error"] = f"{type(future.exception()).__name__}: {future.exception()}"
+        else:
+            report = future.result()
+            status["status"] = "succeeded" if report["status"] == "success" else "failed"
+            status["error"] = report["error"]
+            status["seconds"] = report["seconds"]
+
+        progress_path = os.path.join(job["workdir"], PROGRESS_PATH)
+        if os.path.exists(progress_path):
+            try:
+                with open(progress_path) as f:
+                    status["progress"] = json.load(f)
+            except ValueError:
+                pass  # being rewritten, the next poll gets it
+        return status
+
+    def artifacts(self, job_id):
+        """Files under the job's `output` directory as `{"name", "bytes"}`; None for an unknown ID."""
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        output_dir = os.path.join(job["workdir"], "output")
+        files = []
+        for root, _, names in os.walk(output_dir):
+            for name in sorted(names):
+                path = os.path.join(root, name)
+                files.append({"name": os.path.relpath(path, output_dir), "bytes": os.path.getsize(path)})
+        return sorted(files, key=lambda f: f["name"])
+
+    def artifact_path(self, job_id, name):
+        """Absolute path of one output file of the job, or None (unknown job, missing file, or outside `output`)."""
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        output_dir = os.path.realpath(os.path.join(job["workdir"], "output"))
+        path = os.path.realpath(os.path.join(output_dir, name))
+        if not path.startswith(output_dir + os.sep) or not os.path.isfile(path):
+            return None
+        return path
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
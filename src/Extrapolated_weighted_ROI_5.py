@@ -8,6 +8,12 @@ from dateutil.relativedelta import relativedelta
 import warnings
 import os
 
+from dtype_policy import fill_dimension
+from granularity import name_granularities
+from metric_pool import map_metrics
+from run_context import artifact_name, has_artifact, load_artifact, save_artifact, workspace_path
+from scurve_engine import expected_roi, get_kernel_bank
+
 warnings.filterwarnings("ignore")
 
 # Setup logging
@@ -24,7 +30,130 @@ def join_non_null(row):
     return '|'.join(non_null_values)
 
 
-def LTROI_RROI(config):
+def metric_ltroi(config, metric, context, kernels, model_start_week_no):
+    """Expected ROI and sales of one metric from its weekly results and S-curve kernels."""
+    features, weights = kernels[metric]
+    try:
+        input_path = f"./output/Weekly ROI Format/{config['brand']}_{metric}_Weekly_results.xlsx"
+        
+        print(f"\nProcessing metric: {metric}")
+        print(f"Input file path: {input_path}")
+        logging.info(f"Processing metric: {metric} | Input file: {input_path}")
+
+        if not has_artifact(context, input_path):
+            logging.warning(f"File {input_path} does not exist. Skipping {metric}.")
+            print(f"File {input_path} does not exist. Skipping {metric}.")
+            return None
+
+        data_rroi = load_artifact(context, input_path)
+        data_rroi['Date'] = pd.to_datetime(data_rroi['Date'])
+        data_rroi['Year'] = data_rroi['Date'].dt.isocalendar()['year']
+        data_rroi['Week'] = data_rroi['Date'].dt.isocalendar()['week']
+
+        if config['ProductLine_Flag'] == 1:
+            data_rroi['Feature'] = name_granularities(
+                data_rroi, ["Media Type", "Product Line", "Master Channel", "Channel", "Platform"], join_non_null
+            )
+            p_list = ["Media Type", "Product Line", "Master Channel", "Channel", "Platform"]
+        elif config['ProductLine_Flag'] == 2:
+            data_rroi['Feature'] = name_granularities(
+                data_rroi, ["Media Type", "Product Line", "Master Channel", "Channel"], join_non_null
+            )
+            p_list = ["Media Type", "Product Line", "Master Channel", "Channel"]
+        else:
+            logging.warning(f"Invalid ProductLine_Flag: {config['ProductLine_Flag']}")
+            print(f"Invalid ProductLine_Flag: {config['ProductLine_Flag']}")
+            return None
+
+        data_rroi1 = data_rroi[
+            data_rroi['Media Type'].isin(config["expected_sales_media_type"])
+        ].reset_index(drop=True)
+
+        for col in p_list:
+            data_rroi1[col] = fill_dimension(data_rroi1[col], "None")
+        data_rroi1["Impressions"].fillna(0, inplace=True)
+        data_rroi1["Actual ROI"].fillna(0, inplace=True)
+
+        pivot_final_aroi = data_rroi1.pivot_table(
+            index=['Year', 'Week'],
+            columns=p_list,
+            values=['Actual ROI'],
+            aggfunc=np.sum,
+            observed=True
+        ).reset_index()
+
+        p_feats = pivot_final_aroi.columns.to_numpy()
+        p_cols = []
+        for i in p_feats:
+            col = []
+            for j in i[1:]:
+                if j == "None":
+                    continue
+                col.append(j)
+            p_cols.append("|".join(col))
+        p_cols = np.array(p_cols)
+        logging.info(f"Feature columns extracted for {metric}: {p_cols}")
+
+        no_of_weeks = len(pivot_final_aroi)
+        logging.info(f"No. of weeks for {metric}: {no_of_weeks}")
+
+        col_index = {}
+        for idx, name in enumerate(p_cols):
+            col_index.setdefault(name, idx)
+        for i in features:
+            assert i in col_index, f"{i} in lag_dict but not in Weekly RROI features: {p_cols}"
+
+        aroi = np.column_stack(
+            [pivot_final_aroi[p_feats[col_index[i]]].to_numpy(dtype=float) for i in features]
+        ) if features else np.zeros((no_of_weeks, 0))
+        logging.info(f"Weight kernels {weights.shape} and actual ROI matrix {aroi.shape} built for {metric}")
+
+        sroi, wroi = expected_roi(aroi, weights, model_start_week_no, method=config.get("scurve_method", "direct"))
+        logging.info(f"SROI and WROI computed for {len(features)} features of {metric}.")
+        print(f"Computed expected ROI for {len(features)} features of {metric}")
+
+        exp_df = pd.DataFrame({
+            "Year": np.tile(pivot_final_aroi["Year"].to_numpy(), len(features)),
+            "Week": np.tile(pivot_final_aroi["Week"].to_numpy(), len(features)),
+            "Feature": np.repeat(features, no_of_weeks),
+            "Expected Simple ROI": sroi.T.ravel(),
+            "Expected Weighted ROI": wroi.T.ravel(),
+        })
+
+        data_rroi = pd.merge(
+            left=data_rroi,
+            right=exp_df,
+            on=['Year', 'Week', 'Feature'],
+            how='left'
+        )
+        data_rroi.drop(columns=['Feature'], inplace=True)
+
+        data_rroi['Expected Simple Sales'] = np.where(
+            data_rroi['Expected Simple ROI'].isna() | data_rroi['Impressions'].isna(),
+            np.nan,
+            data_rroi['Expected Simple ROI'] * data_rroi['Impressions']
+        )
+
+        data_rroi['Expected Weighted Sales'] = np.where(
+            data_rroi['Expected Weighted ROI'].isna() | data_rroi['Impressions'].isna(),
+            np.nan,
+            data_rroi['Expected Weighted ROI'] * data_rroi['Impressions']
+        )
+
+        output_path = f"./output/Extrapolated Data/LTROI_{config['brand']}_rroi_{metric}.xlsx"
+        save_artifact(context, data_rroi, output_path)
+        print(f"Stored artifact for {metric}: {output_path}")
+        logging.info(f"LTROI RROI output saved: {output_path}")
+        logging.info(f"-"*100)
+        return output_path
+
+    except Exception as e:
+        logging.exception(f"Failed processing metric {metric}: {e}")
+        print(f"Error processing {metric}: {e}")
+        return None
+
+
+def LTROI_RROI(config, context=None):
     logging.info("LTROI_RROI execution started.")
 
     try:
@@ -53,7 +182,7 @@ def LTROI_RROI(config):
         logging.info(f"Loading lag file from: {lag_file_path}")
 
         data_lag = pd.read_excel(
-            lag_file_path,
+            workspace_path(context, lag_file_path),
             sheet_name='Lag File',
             engine='openpyxl'
         ).T
@@ -74,154 +203,29 @@ def LTROI_RROI(config):
     metrics_list = [m for m in config.get("metrics", []) if m not in skip_metrics]
     logging.info(f"Metrics to process: {metrics_list}")
 
-    required_cols = ["Media Type", "Product Line", "Master Channel", "Channel", "Platform"]
+    kernel_bank = get_kernel_bank(config)
 
+    kernels = {}
     for metric in metrics_list:
         try:
-            input_path = f"./output/Weekly ROI Format/{config['brand']}_{metric}_Weekly_results.xlsx"
-            
-            print(f"\nProcessing metric: {metric}")
-            print(f"Input file path: {input_path}")
-            logging.info(f"Processing metric: {metric} | Input file: {input_path}")
-
-            if not os.path.exists(input_path):
-                logging.warning(f"File {input_path} does not exist. Skipping {metric}.")
-                print(f"File {input_path} does not exist. Skipping {metric}.")
-                continue
-
-            data_rroi = pd.read_excel(input_path)
-            data_rroi['Date'] = pd.to_datetime(data_rroi['Date'])
-            data_rroi['Year'] = data_rroi['Date'].dt.isocalendar()['year']
-            data_rroi['Week'] = data_rroi['Date'].dt.isocalendar()['week']
-
-            if config['ProductLine_Flag'] == 1:
-                data_rroi['Feature'] = data_rroi[
-                    ["Media Type", "Product Line", "Master Channel", "Channel", "Platform"]
-                ].apply(join_non_null, axis=1)
-                p_list = ["Media Type", "Product Line", "Master Channel", "Channel", "Platform"]
-            elif config['ProductLine_Flag'] == 2:
-                data_rroi['Feature'] = data_rroi[
-                    ["Media Type", "Product Line", "Master Channel", "Channel"]
-                ].apply(join_non_null, axis=1)
-                p_list = ["Media Type", "Product Line", "Master Channel", "Channel"]
-            else:
-                logging.warning(f"Invalid ProductLine_Flag: {config['ProductLine_Flag']}")
-                print(f"Invalid ProductLine_Flag: {config['ProductLine_Flag']}")
-                continue
-
-            data_rroi1 = data_rroi[
-                data_rroi['Media Type'].isin(config["expected_sales_media_type"])
-            ].reset_index(drop=True)
-
-            for col in p_list:
-                data_rroi1[col].fillna("None", inplace=True)
-            data_rroi1["Impressions"].fillna(0, inplace=True)
-            data_rroi1["Actual ROI"].fillna(0, inplace=True)
-
-            pivot_final_aroi = data_rroi1.pivot_table(
-                index=['Year', 'Week'],
-                columns=p_list,
-                values=['Actual ROI'],
-                aggfunc=np.sum
-            ).reset_index()
-
-            p_feats = pivot_final_aroi.columns.to_numpy()
-            p_cols = []
-            for i in p_feats:
-                col = []
-                for j in i[1:]:
-                    if j == "None":
-                        continue
-                    col.append(j)
-                p_cols.append("|".join(col))
-            p_cols = np.array(p_cols)
-            logging.info(f"Feature columns extracted for {metric}: {p_cols}")
-
-            no_of_weeks = len(pivot_final_aroi)
-            logging.info(f"No. of weeks for {metric}: {no_of_weeks}")
-            SROI, WROI = {}, {}
-
-            for i in scurve_dict[metric].keys():
-                alpha, beta = scurve_dict[metric][i]
-                logging.info(f"Processing feature {i} | alpha={alpha}, beta={beta}")
-                print(f"Processing feature {i} | alpha={alpha}, beta={beta}")
-
-                x = np.arange(1, 79)
-                w_raw = ((100 * alpha ** (100 * x / 78) * np.log(alpha) * beta ** (alpha ** (100 * x / 78))) *
-                         (np.log(beta) - np.log(10 ** 10))) / (((10 ** 10) ** (alpha ** (100 * x / 78))) * 78)
-                w = w_raw / sum(w_raw)
-                logging.info(f"Weight vector created for {i}, sum={sum(w):.6f}")
-
-                M1 = np.zeros((no_of_weeks, 78 + (no_of_weeks - 1)))
-                M2 = np.zeros((no_of_weeks, 78 + (no_of_weeks - 1)))
-                for wi in range(no_of_weeks):
-                    M1[wi, wi:wi + 78] = w
-                    M2[wi, wi:wi + 78] = 1
-                logging.info(f"M1 shape={M1.shape}, M2 shape={M2.shape}")
-
-                M3 = np.zeros((78 + no_of_weeks - 1, 1))
-                M4 = np.zeros((78 + no_of_weeks - 1, 1))
-
-                assert i in p_cols, f"{i} in lag_dict but not in Weekly RROI features: {p_cols}"
-                aroi = pivot_final_aroi[p_feats[p_cols == i][0]]
-
-                M3[:no_of_weeks, 0] = aroi.to_numpy()
-                M4[model_start_week_no:no_of_weeks, 0] = 1
-                logging.info(f"M3 and M4 initialized for feature {i} | M3 shape={M3.shape}, M4 shape={M4.shape}")
-
-                Sf = (78 + (no_of_weeks - 1)) / np.matmul(M2, M4)
-                Wf = 1 / np.matmul(M1, M4)
-                logging.info(f"Sf shape={Sf.shape}, Wf shape={Wf.shape}")
-
-                Sroi = np.matmul(M1, M3) * Sf
-                Wroi = np.matmul(M1, M3) * Wf
-                SROI[i] = Sroi
-                WROI[i] = Wroi
-                logging.info(f"SROI and WROI computed for feature {i}.")
-                
-
-            exp_df = pd.DataFrame(columns=["Year", "Week", "Feature", "Expected Simple ROI", "Expected Weighted ROI"])
-            for f_name in SROI.keys():
-                exp_df_temp = pd.DataFrame()
-                exp_df_temp['Expected Simple ROI'] = SROI[f_name].flatten().tolist()
-                exp_df_temp['Expected Weighted ROI'] = WROI[f_name].flatten().tolist()
-                exp_df_temp['Feature'] = f_name
-                exp_df_temp['Year'] = pivot_final_aroi["Year"]
-                exp_df_temp['Week'] = pivot_final_aroi["Week"]
-                exp_df_temp = exp_df_temp[exp_df.columns]
-                exp_df = pd.concat([exp_df, exp_df_temp], axis=0).reset_index(drop=True)
-
-            data_rroi = pd.merge(
-                left=data_rroi,
-                right=exp_df,
-                on=['Year', 'Week', 'Feature'],
-                how='left'
-            )
-            data_rroi.drop(columns=['Feature'], inplace=True)
-
-            data_rroi['Expected Simple Sales'] = np.where(
-                data_rroi['Expected Simple ROI'].isna() | data_rroi['Impressions'].isna(),
-                np.nan,
-                data_rroi['Expected Simple ROI'] * data_rroi['Impressions']
-            )
-
-            data_rroi['Expected Weighted Sales'] = np.where(
-                data_rroi['Expected Weighted ROI'].isna() | data_rroi['Impressions'].isna(),
-                np.nan,
-                data_rroi['Expected Weighted ROI'] * data_rroi['Impressions']
-            )
-
-            output_path = f"./output/Extrapolated Data/LTROI_{config['brand']}_rroi_{metric}.xlsx"
-            data_rroi.to_excel(output_path, index=False)
-            print(f"Saved output for {metric}: {output_path}")
-            logging.info(f"LTROI RROI output saved: {output_path}")
-            logging.info(f"-"*100)
-
-
+            features = list(scurve_dict[metric].keys())
+            params = np.array([scurve_dict[metric][i] for i in features], dtype=float).reshape(-1, 2)
+            kernels[metric] = (features, kernel_bank.weights(params[:, 0], params[:, 1]))
         except Exception as e:
-            logging.exception(f"Failed processing metric {metric}: {e}")
+            logging.exception(f"Failed building S-curve kernels for {metric}: {e}")
             print(f"Error processing {metric}: {e}")
-            continue
+
+    map_metrics(
+        metric_ltroi, [m for m in metrics_list if m in kernels], config, context,
+        inputs=lambda m: [artifact_name(f"./output/Weekly ROI Format/{config['brand']}_{m}_Weekly_results.xlsx")],
+        args=(kernels, model_start_week_no),
+    )
+
+    logging.info(f"S-curve kernel bank stats: {kernel_bank.stats()}")
+    if context is not None:
+        context.record("kernel_bank", "scurve", None, **kernel_bank.stats())
+    if kernel_bank.path:
+        kernel_bank.save()
 
     logging.info("LTROI_RROI execution completed.")
     print("LTROI_RROI execution completed.")
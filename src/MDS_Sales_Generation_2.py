@@ -8,20 +8,22 @@ import json
 from datetime import date, datetime, timedelta
 from dateutil.relativedelta import relativedelta
 
+from run_context import load_artifact, save_artifact, workspace_path
+
 logging.basicConfig(
     filename='./output/logs/mds_generation.log',
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
-def mds_sales_and_units_generation(config):
+def mds_sales_and_units_generation(config, context=None):
     try:
         all_date_weekly = pd.date_range(start=config["model_start_date"], end=config["model_end_date"], freq='W')
         all_date_weekly_df = pd.DataFrame({"Date": all_date_weekly})
         logging.info("Generated weekly date range from config.")
 
         # mds_units = pd.read_csv(config['input_files']["modelB_raw_abs"]) # Excel also
-        mds_units = pd.read_excel(config['input_files']["modelB_raw_abs"]) # Excel also
+        mds_units = pd.read_excel(workspace_path(context, config['input_files']["modelB_raw_abs"])) # Excel also
         # mds_units = pd.read_excel(config["modelB_raw_abs"]) # Excel also
         mds_units.rename(columns={'Pure_Baseline': 'Baseline'}, inplace=True)
 
@@ -48,7 +50,7 @@ def mds_sales_and_units_generation(config):
                 print(kpi)
 
                 file_path = f"./input/Data/{config['brand']}_weekly {kpi}.xlsx"
-                df_temp = pd.read_excel(file_path)
+                df_temp = load_artifact(context, file_path)
                 df_temp["Date"] = pd.to_datetime(df_temp["Date"])
                 print(df_temp)
 
@@ -65,8 +67,8 @@ def mds_sales_and_units_generation(config):
                 req_sales = req_sales[metric].reset_index(drop=True)  ## ---- This part is Re-Edited
 
                 output_path = f"./input/Data/mds_{kpi}.xlsx"
-                req_sales.to_excel(output_path, index=False)
-                logging.info(f"Saved computed MDS sales for {kpi} to {output_path}")
+                save_artifact(context, req_sales, output_path)
+                logging.info(f"Stored computed MDS sales for {kpi} as {output_path}")
             except Exception as e:
                 logging.error(f"Error processing KPI '{kpi}': {e}")
                 continue
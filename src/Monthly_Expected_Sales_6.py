@@ -9,6 +9,11 @@ from dateutil.relativedelta import relativedelta
 import json
 import warnings
 
+from dtype_policy import fill_dimension
+from granularity import name_granularities
+from metric_pool import map_metrics
+from run_context import artifact_name, load_artifact, save_artifact
+
 warnings.filterwarnings('ignore')
 
 # Setup logging
@@ -21,7 +26,204 @@ logging.basicConfig(
 )
 
 
-def generate_expected_sales(config):
+EQUAL_DIV_COLS = ["Weighted Impressions", "Expected Simple Sales", "Expected Weighted Sales"]
+
+
+def allocate_to_months(req_weekly_df, metrics, key_cols, df_daily_ratio, div_with_sales):
+    """Weekly -> daily -> monthly allocation for all groups at once.
+
+    Every day takes the value of the week ending on or after it (the daily
+    bfill), scaled by the 3/7 and /7 split and the daily sales ratio. Summing
+    those day weights per (week, month) gives one allocation matrix per
+    column, so the monthly table is a single (groups x weeks) @ (weeks x months)
+    product and the daily table is never built. Returns None when the groups
+    do not share one complete weekly grid; allocate_by_group handles that case.
+    """
+    value_cols = [col for col in req_weekly_df.columns if col not in ["Date", "name"] + key_cols]
+    if not pd.api.types.is_datetime64_any_dtype(req_weekly_df["Date"]):
+        return None
+    if not all(pd.api.types.is_numeric_dtype(req_weekly_df[col]) for col in value_cols):
+        return None
+    if req_weekly_df[value_cols].isna().any().any():
+        return None
+
+    dates = np.sort(req_weekly_df["Date"].unique())
+    group_codes, _ = pd.factorize(req_weekly_df["name"])
+    no_of_groups, no_of_weeks = group_codes.max() + 1, len(dates)
+    week_idx = np.searchsorted(dates, req_weekly_df["Date"].to_numpy())
+    cells = group_codes * no_of_weeks + week_idx
+    if len(cells) != no_of_groups * no_of_weeks or len(np.unique(cells)) != len(cells):
+        return None
+
+    days = pd.date_range(dates[0], dates[-1], freq="D")
+    day_week = np.searchsorted(dates, days.to_numpy())
+    month_codes, month_keys = pd.factorize(days.year * 100 + days.month)
+    no_of_months = len(month_keys)
+    alloc_index = day_week * no_of_months + month_codes
+
+    group_keys = req_weekly_df.drop_duplicates("name")[key_cols]
+    df_final = group_keys.loc[group_keys.index.repeat(no_of_months)].reset_index(drop=True)
+
+    for col in value_cols:
+        day_weight = np.ones(len(days))
+        if metrics != "Pure_Baseline" and col in EQUAL_DIV_COLS:
+            day_weight[0] = 1 / (3 / 7)
+            day_weight[1:] = 1 / 7
+
+        ratio_col = div_with_sales.get(col)
+        if ratio_col is not None and ratio_col in df_daily_ratio.columns:
+            if len(days) == len(df_daily_ratio):
+                day_weight = df_daily_ratio[ratio_col].to_numpy(dtype=float) * day_weight
+            else:
+                logging.error(f"Error applying ratio for {col}: Length mismatch: {col} vs {ratio_col}")
+
+        allocation = np.bincount(alloc_index, weights=day_weight, minlength=no_of_weeks * no_of_months)
+        weekly = np.zeros((no_of_groups, no_of_weeks))
+        weekly[group_codes, week_idx] = req_weekly_df[col].to_numpy(dtype=float)
+        df_final[col] = (weekly @ allocation.reshape(no_of_weeks, no_of_months)).ravel()
+
+    df_final["Year"] = np.tile(month_keys // 100, no_of_groups).astype("int32")
+    df_final["Month"] = np.tile(month_keys % 100, no_of_groups).astype("int32")
+    logging.info(f"Allocated {no_of_groups} groups x {no_of_weeks} weeks to {no_of_months} months for {metrics}")
+    return df_final
+
+
+def allocate_by_group(req_weekly_df, metrics, df_daily_ratio, div_with_sales):
+    """Resample each group to daily, split and ratio it, one group at a time."""
+    df_final = pd.DataFrame(columns=req_weekly_df.columns)
+
+    for nm in req_weekly_df["name"].unique():
+        logging.info(f"Processing group: {nm}")
+        df_temp = req_weekly_df[req_weekly_df["name"] == nm].reset_index(drop=True)
+        df_temp.set_index("Date", inplace=True)
+
+        try:
+            df_daily = df_temp.resample("D").bfill().copy().reset_index()
+            assert df_daily.isna().sum().sum() == 0, f"df_daily contains null values for {nm}"
+            logging.info(f"Resampled daily df for {nm}, shape={df_daily.shape}")
+        except Exception as e:
+            logging.exception(f"Error in resampling {nm}: {e}")
+            continue
+
+        if metrics != "Pure_Baseline":
+            for v in EQUAL_DIV_COLS:
+                if v in df_daily.columns:
+                    df_daily.loc[0, v] /= (3 / 7)
+                    df_daily.loc[1:, v] /= 7
+                    logging.debug(f"Divided column {v} for {nm}")
+
+        for v in div_with_sales.keys():
+            ratio_col = div_with_sales[v]
+            if v in df_daily.columns and ratio_col in df_daily_ratio.columns:
+                try:
+                    assert len(df_daily[v]) == len(df_daily_ratio[ratio_col]), \
+                        f"Length mismatch: {v} vs {ratio_col}"
+                    df_daily[v] = df_daily_ratio[ratio_col] * df_daily[v]
+                    logging.debug(f"Applied ratio for {v} using {ratio_col}")
+                except Exception as e:
+                    logging.exception(f"Error applying ratio for {v}: {e}")
+
+        df_daily = df_daily[req_weekly_df.columns]
+        df_final = pd.concat([df_final, df_daily], axis=0).reset_index(drop=True)
+
+    df_final["Year"] = df_final["Date"].dt.year
+    df_final["Month"] = df_final["Date"].dt.month
+    df_final.drop(columns=["Date", "name"], inplace=True)
+    return df_final
+
+
+def metric_expected_sales(config, metrics, context, df_daily_ratio, temp_all_date_weekly, div_with_sales):
+    """Monthly expected sales of one metric (or Pure_Baseline)."""
+    logging.info(f"Processing metric: {metrics}")
+    print(f"\nProcessing metric: {metrics}")
+
+    try:
+        if metrics == "Pure_Baseline":
+            input_path = f"./output/Weekly ROI Format/{config['brand']}_{metrics}_Weekly_results.xlsx"
+            expected_sales_df = load_artifact(context, input_path)
+            expected_sales_df = pd.merge(temp_all_date_weekly, expected_sales_df, on="Date", how="left")
+            expected_sales_df["Metrics"] = "Pure_Baseline"
+            expected_sales_df.fillna(0, inplace=True)
+            logging.info(f"Pure_Baseline file loaded: {input_path}, shape={expected_sales_df.shape}")
+        else:
+            input_path = f"./output/Extrapolated Data/LTROI_{config['brand']}_rroi_{metrics}.xlsx"
+            expected_sales_df = load_artifact(context, input_path)
+            logging.info(f"File loaded for {metrics}: {input_path}, shape={expected_sales_df.shape}")
+    except Exception as e:
+        logging.exception(f"Error loading file for {metrics}: {e}")
+        return None
+
+    req_weekly_df = expected_sales_df.copy()
+
+    if "Impressions" in req_weekly_df.columns:
+        req_weekly_df.drop(columns=['Impressions'], inplace=True)
+
+    exclude_cols = ['Date', 'Actual ROI', 'Year', 'Week', 'Expected Simple ROI', 'Expected Weighted ROI']
+
+    num_col = [
+        col for col in req_weekly_df.columns
+        if col not in exclude_cols and pd.api.types.is_numeric_dtype(req_weekly_df[col])
+    ]
+    str_col = [
+        col for col in req_weekly_df.columns
+        if col not in num_col + exclude_cols
+    ]
+
+    logging.info(f"For {metrics}: String cols={str_col}, Numeric cols={num_col}")
+    print(f"String columns for {metrics}: {str_col}")
+    print(f"Numeric columns for {metrics}: {num_col}")
+
+    # Fill NA in numeric columns
+    for col in num_col:
+        req_weekly_df[col].fillna(0, inplace=True)
+
+    # Fill NA in string columns
+    for col in str_col:
+        req_weekly_df[col] = fill_dimension(req_weekly_df[col], "None")
+
+    # Prepare 'name' column
+    if metrics != "Pure_Baseline":
+        req_weekly_df["name"] = name_granularities(req_weekly_df, str_col, lambda x: "|".join(x[:]))
+        req_weekly_df = req_weekly_df[["Date"] + str_col + num_col + ["name"]]
+    else:
+        req_weekly_df.rename(columns={"Metrics": "name"}, inplace=True)
+
+    key_cols = str_col if metrics != "Pure_Baseline" else []
+    df_final = allocate_to_months(req_weekly_df, metrics, key_cols, df_daily_ratio, div_with_sales)
+    if df_final is None:
+        logging.info(f"Groups of {metrics} do not share one weekly grid, allocating group by group")
+        df_final = allocate_by_group(req_weekly_df, metrics, df_daily_ratio, div_with_sales)
+
+    if metrics != "Pure_Baseline":
+        group_cols = str_col + ["Year", "Month"]
+    else:
+        group_cols = ["Year", "Month"]
+        if 'Media Type' in df_final.columns:
+            group_cols.append('Media Type')
+
+    logging.info(f"Grouping columns for {metrics}: {group_cols}")
+    print(f"Grouping columns for {metrics}: {group_cols}")
+
+    try:
+        df_final = df_final.groupby(group_cols, observed=True).sum().reset_index()
+        logging.info(f"Grouped df for {metrics}, shape={df_final.shape}")
+        print(f"Available columns for {metrics}:", df_final.columns.tolist())
+    except Exception as e:
+        logging.exception(f"Error in grouping {metrics}: {e}")
+        return None
+
+    output_path = f"./output/Extrapolated Data/monthly_expected_sales_{config['brand']}_{metrics}.xlsx"
+    try:
+        save_artifact(context, df_final, output_path)
+        logging.info(f"Saved file for {metrics}: {output_path}")
+        print(f"Saved file for {metrics} at {output_path}")
+    except Exception as e:
+        logging.exception(f"Error saving file for {metrics}: {e}")
+
+    return df_final
+
+
+def generate_expected_sales(config, context=None):
     final_df_dict = {}
 
     try:
@@ -44,7 +246,7 @@ def generate_expected_sales(config):
         raise
 
     try:
-        daily_ratio_temp_1 = pd.read_excel(f"./input/Data/{config['brand']}_daily_ratio_for_lt.xlsx")
+        daily_ratio_temp_1 = load_artifact(context, f"./input/Data/{config['brand']}_daily_ratio_for_lt.xlsx")
         df_daily_ratio = pd.merge(df_ratio_temp, daily_ratio_temp_1, on="Date", how="left").fillna(0)
         logging.info("Daily ratio file loaded and merged successfully")
         print("Daily ratio file loaded")
@@ -64,132 +266,20 @@ def generate_expected_sales(config):
     logging.info(f"Division with sales mapping created: {div_with_sales}")
     print("Division with sales mapping:", div_with_sales)
 
-    metrics_lst = config.get("metrics", [])
+    metrics_lst = list(config.get("metrics", []))
     metrics_lst.append("Pure_Baseline")
     logging.info(f"Metrics to process: {metrics_lst}")
 
-    for metrics in metrics_lst:
-        logging.info(f"Processing metric: {metrics}")
-        print(f"\nProcessing metric: {metrics}")
+    def metric_inputs(metrics):
+        if metrics == "Pure_Baseline":
+            return [artifact_name(f"./output/Weekly ROI Format/{config['brand']}_{metrics}_Weekly_results.xlsx")]
+        return [artifact_name(f"./output/Extrapolated Data/LTROI_{config['brand']}_rroi_{metrics}.xlsx")]
 
-        try:
-            if metrics == "Pure_Baseline":
-                input_path = f"./output/Weekly ROI Format/{config['brand']}_{metrics}_Weekly_results.xlsx"
-                expected_sales_df = pd.read_excel(input_path)
-                expected_sales_df = pd.merge(temp_all_date_weekly, expected_sales_df, on="Date", how="left")
-                expected_sales_df["Metrics"] = "Pure_Baseline"
-                expected_sales_df.fillna(0, inplace=True)
-                logging.info(f"Pure_Baseline file loaded: {input_path}, shape={expected_sales_df.shape}")
-            else:
-                input_path = f"./output/Extrapolated Data/LTROI_{config['brand']}_rroi_{metrics}.xlsx"
-                expected_sales_df = pd.read_excel(input_path)
-                logging.info(f"File loaded for {metrics}: {input_path}, shape={expected_sales_df.shape}")
-        except Exception as e:
-            logging.exception(f"Error loading file for {metrics}: {e}")
-            continue
-
-        req_weekly_df = expected_sales_df.copy()
-
-        if "Impressions" in req_weekly_df.columns:
-            req_weekly_df.drop(columns=['Impressions'], inplace=True)
-
-        exclude_cols = ['Date', 'Actual ROI', 'Year', 'Week', 'Expected Simple ROI', 'Expected Weighted ROI']
-
-        num_col = [
-            col for col in req_weekly_df.columns
-            if col not in exclude_cols and pd.api.types.is_numeric_dtype(req_weekly_df[col])
-        ]
-        str_col = [
-            col for col in req_weekly_df.columns
-            if col not in num_col + exclude_cols
-        ]
-
-        logging.info(f"For {metrics}: String cols={str_col}, Numeric cols={num_col}")
-        print(f"String columns for {metrics}: {str_col}")
-        print(f"Numeric columns for {metrics}: {num_col}")
-
-        # Fill NA in numeric columns
-        for col in num_col:
-            req_weekly_df[col].fillna(0, inplace=True)
-
-        # Fill NA in string columns
-        for col in str_col:
-            req_weekly_df[col].fillna("None", inplace=True)
-
-        # Prepare 'name' column
-        if metrics != "Pure_Baseline":
-            req_weekly_df["name"] = req_weekly_df[str_col].apply(lambda x: "|".join(x[:]), axis=1)
-            req_weekly_df = req_weekly_df[["Date"] + str_col + num_col + ["name"]]
-        else:
-            req_weekly_df.rename(columns={"Metrics": "name"}, inplace=True)
-
-        df_final = pd.DataFrame(columns=req_weekly_df.columns)
-
-        for nm in req_weekly_df["name"].unique():
-            logging.info(f"Processing group: {nm}")
-            df_temp = req_weekly_df[req_weekly_df["name"] == nm].reset_index(drop=True)
-            df_temp.set_index("Date", inplace=True)
-
-            try:
-                df_daily = df_temp.resample("D").bfill().copy().reset_index()
-                assert df_daily.isna().sum().sum() == 0, f"df_daily contains null values for {nm}"
-                logging.info(f"Resampled daily df for {nm}, shape={df_daily.shape}")
-            except Exception as e:
-                logging.exception(f"Error in resampling {nm}: {e}")
-                continue
-
-            if metrics != "Pure_Baseline":
-                equal_div = ["Weighted Impressions", "Expected Simple Sales", "Expected Weighted Sales"]
-                for v in equal_div:
-                    if v in df_daily.columns:
-                        df_daily.loc[0, v] /= (3 / 7)
-                        df_daily.loc[1:, v] /= 7
-                        logging.debug(f"Divided column {v} for {nm}")
-
-            for v in div_with_sales.keys():
-                ratio_col = div_with_sales[v]
-                if v in df_daily.columns and ratio_col in df_daily_ratio.columns:
-                    try:
-                        assert len(df_daily[v]) == len(df_daily_ratio[ratio_col]), \
-                            f"Length mismatch: {v} vs {ratio_col}"
-                        df_daily[v] = df_daily_ratio[ratio_col] * df_daily[v]
-                        logging.debug(f"Applied ratio for {v} using {ratio_col}")
-                    except Exception as e:
-                        logging.exception(f"Error applying ratio for {v}: {e}")
-
-            df_daily = df_daily[req_weekly_df.columns]
-            df_final = pd.concat([df_final, df_daily], axis=0).reset_index(drop=True)
-
-        df_final["Year"] = df_final["Date"].dt.year
-        df_final["Month"] = df_final["Date"].dt.month
-        df_final.drop(columns=["Date", "name"], inplace=True)
-
-        if metrics != "Pure_Baseline":
-            group_cols = str_col + ["Year", "Month"]
-        else:
-            group_cols = ["Year", "Month"]
-            if 'Media Type' in df_final.columns:
-                group_cols.append('Media Type')
-
-        logging.info(f"Grouping columns for {metrics}: {group_cols}")
-        print(f"Grouping columns for {metrics}: {group_cols}")
-
-        try:
-            df_final = df_final.groupby(group_cols).sum().reset_index()
-            logging.info(f"Grouped df for {metrics}, shape={df_final.shape}")
-            print(f"Available columns for {metrics}:", df_final.columns.tolist())
-        except Exception as e:
-            logging.exception(f"Error in grouping {metrics}: {e}")
-            continue
-
-        final_df_dict[metrics] = df_final
-        output_path = f"./output/Extrapolated Data/monthly_expected_sales_{config['brand']}_{metrics}.xlsx"
-        try:
-            df_final.to_excel(output_path, index=False)
-            logging.info(f"Saved file for {metrics}: {output_path}")
-            print(f"Saved file for {metrics} at {output_path}")
-        except Exception as e:
-            logging.exception(f"Error saving file for {metrics}: {e}")
+    results = map_metrics(metric_expected_sales, metrics_lst, config, context, inputs=metric_inputs,
+                          args=(df_daily_ratio, temp_all_date_weekly, div_with_sales))
+    for metrics, df_final in zip(metrics_lst, results):
+        if df_final is not None:
+            final_df_dict[metrics] = df_final
 
     logging.info("-" * 100)
     logging.info("All metrics processed successfully.")
@@ -8,6 +8,9 @@ from datetime import datetime, timedelta
 from dateutil.relativedelta import relativedelta
 import json
 
+from granularity import GRANULARITY_ID, decode_granularity, encode_granularity, granularity_columns
+from run_context import load_artifact, save_artifact
+
 # Logging Setup
 logging.basicConfig(
     filename='./output/logs/expected_sales.log',
@@ -33,10 +36,10 @@ def transform_dataframe(df_p, config):
     return df
 
 
-def process_expected_sales(config):
+def process_expected_sales(config, context=None):
     try:
         final_df_dict = {}
-        metrics_list = config.get("metrics", [])
+        metrics_list = list(config.get("metrics", []))
         metrics_list.append("Pure_Baseline")
         logging.info(f"Metrics to process: {metrics_list}")
         print(f"Processing metrics: {metrics_list}")
@@ -45,7 +48,7 @@ def process_expected_sales(config):
         for i, metric in enumerate(metrics_list):
             file_path = f"./output/Extrapolated Data/monthly_expected_sales_{config['brand']}_{metric}.xlsx"
             logging.info(f"Loading metric {metric} from {file_path}")
-            df = pd.read_excel(file_path)
+            df = load_artifact(context, file_path)
             print(f"Loaded {metric}: {df.shape}")
 
             # Handle Pure Baseline
@@ -85,30 +88,24 @@ def process_expected_sales(config):
         lt_res = final_df_dict[config['metrics'][0]].copy()
         logging.info("Starting merge of metrics into lt_res")
 
-        if config['ProductLine_Flag'] == 1:
-            logging.info("Merging using ProductLine_Flag = 1")
-            for metric in config['metrics'][1:]:
-                if metric != "Pure_Baseline":
-                    lt_res = pd.merge(
-                        lt_res,
-                        final_df_dict[metric],
-                        on=['Media Type', 'Product Line', 'Master Channel', 'Channel',
-                            'Platform', 'Year', 'Month'],
-                        how='left'
-                    )
-                    logging.info(f"Merged {metric} into lt_res, shape now {lt_res.shape}")
-
-        elif config['ProductLine_Flag'] == 2:
-            logging.info("Merging using ProductLine_Flag = 2")
-            for metric in config['metrics'][1:]:
-                if metric != "Pure_Baseline":
-                    lt_res = pd.merge(
-                        lt_res,
-                        final_df_dict[metric],
-                        on=['Media Type', 'Product Line', 'Master Channel', 'Channel', 'Year', 'Month'],
-                        how='left'
-                    )
-                    logging.info(f"Merged {metric} into lt_res, shape now {lt_res.shape}")
+        if config['ProductLine_Flag'] in (1, 2):
+            logging.info(f"Merging using ProductLine_Flag = {config['ProductLine_Flag']}")
+            granularity_cols = granularity_columns(config['ProductLine_Flag'])
+            merge_metrics = [m for m in config['metrics'][1:] if m != "Pure_Baseline"]
+            frames = [lt_res] + [final_df_dict[m] for m in merge_metrics]
+
+            # Column layout of the legacy merges on the granularity columns, then one integer join per metric
+            order = lt_res.iloc[:0]
+            for df in frames[1:]:
+                order = pd.merge(order, df.iloc[:0], on=granularity_cols + ['Year', 'Month'], how='left')
+
+            encoded, dim = encode_granularity(frames, granularity_cols)
+            lt_res = encoded[0]
+            for metric, df in zip(merge_metrics, encoded[1:]):
+                lt_res = pd.merge(lt_res, df, on=[GRANULARITY_ID, 'Year', 'Month'], how='left')
+                logging.info(f"Merged {metric} into lt_res, shape now {lt_res.shape}")
+            lt_res = decode_granularity(lt_res, dim, order.columns)
+            logging.info(f"{len(dim)} granularities merged on integer IDs")
 
         # Merge Pure Baseline
         lt_res = pd.merge(
@@ -153,7 +150,7 @@ def process_expected_sales(config):
             req_format_lt = transform_dataframe(lt_res, config)
 
         save_path = f"./output/Extrapolated Data/Only_LT_lt_rroi_{config['brand']}_Original_Platform.xlsx"
-        req_format_lt.to_excel(save_path, index=False)
+        save_artifact(context, req_format_lt, save_path)
         logging.info(f"Saved intermediate LT results to {save_path}")
         print(f"Saved Original Platform file: {save_path}")
 
@@ -173,25 +170,25 @@ def process_expected_sales(config):
                 'All',
                 req_format_lt['Platform']
             )
-            req_format_lt.to_excel(brand_save_path, index=False)
+            save_artifact(context, req_format_lt, brand_save_path)
 
         elif config["brand"] in BnW:
             logging.info("BnW brand detected.")
             print("BnW brands is executing")
-            req_format_lt.to_excel(brand_save_path, index=False)
+            save_artifact(context, req_format_lt, brand_save_path)
 
         elif config["brand"] in NIC:
             logging.info("NIC brand detected.")
             print("NIC brands is executing")
-            req_format_lt.to_excel(brand_save_path, index=False)
+            save_artifact(context, req_format_lt, brand_save_path)
 
         elif config["brand"] == "Kraken":
             logging.info("Kraken brand detected.")
             print("Kraken is executing")
-            req_format_lt.to_excel(brand_save_path, index=False)
+            save_artifact(context, req_format_lt, brand_save_path)
 
-        logging.info("Final results saved successfully.")
-        print(f"Final results saved at {brand_save_path}")
+        logging.info("Final results stored successfully.")
+        print(f"Stored artifact {brand_save_path}")
 
         logging.info("-" * 100)
         return req_format_lt
@@ -6,6 +6,11 @@ import numpy as np
 from datetime import date, datetime, timedelta
 from dateutil.relativedelta import relativedelta
 
+from dtype_policy import fill_dimension, is_dimension
+from granularity import merge_on_granularity
+from reshape import wide_to_long
+from run_context import load_artifact, save_artifact, workspace_path
+
 # Initialize logging
 try:
     logging.basicConfig(
@@ -24,36 +29,24 @@ def transform_dataframe(df, config):
     logging.info(f"Transforming dataframe for KPI: {kpi}")
     df['Date'] = pd.to_datetime(df['Date'])
 
-    for col in df.columns:
-        col_split = col.split("|")
-        if 'effect_essence' in col_split:
-            col_split = col_split[:-2]
-        if 'Impressions' in col_split:
-            col_split.remove("Impressions")
-        if 'Cost' in col_split:
-            col_split.remove("Cost")
-        df.rename(columns={col: "|".join(col_split)}, inplace=True)
-
-    df.set_index('Date', inplace=True)
-    transformed_df = pd.DataFrame(df.T.unstack()).reset_index()
-    transformed_df.rename({'level_1': "Merged Granularity", 0: f'{kpi}'}, axis=1, inplace=True)
+    transformed_df = wide_to_long(df, f'{kpi}')
     logging.info("Dataframe transformed successfully.")
     return transformed_df
 
 
-def STROI(config):
+def STROI(config, context=None):
     logging.info("STROI processing started.")
     try:
         # Load LT ROI
         lt_file = f"./output/Extrapolated Data/Only_LT_lt_rroi_{config['brand']}.xlsx"
-        req_format_lt = pd.read_excel(lt_file)
+        req_format_lt = load_artifact(context, lt_file)
         req_format_lt.rename(columns={'Channel/Daypart': 'Channel'}, inplace=True)
         logging.info(f"Loaded LT ROI file: {lt_file}, shape: {req_format_lt.shape}")
         print(f"Loaded LT ROI for {config['brand']}: {req_format_lt.shape}")
 
         # Load ST ROI
         st_file = f"./input/Data/ST ROI.xlsx"
-        st_rroi_df = pd.read_excel(st_file, sheet_name='ROI Format')
+        st_rroi_df = pd.read_excel(workspace_path(context, st_file), sheet_name='ROI Format')
         st_rroi_df.rename(columns={'Channel/Daypart': 'Channel'}, inplace=True)
         st_rroi_df.rename(columns={'NTUs': 'Overall NTUs'}, inplace=True)  # Kraken
         st_rroi_df['Date'] = pd.to_datetime(st_rroi_df[['Year', 'Month']].assign(day=1))
@@ -146,8 +139,8 @@ def STROI(config):
     # Fill missing values
     for col in st_rroi_df.columns:
         if col not in ['Year', 'Month']:
-            if st_rroi_df[col].dtype == 'object':
-                st_rroi_df[col].fillna('None', inplace=True)
+            if is_dimension(st_rroi_df[col]):
+                st_rroi_df[col] = fill_dimension(st_rroi_df[col], 'None')
             else:
                 st_rroi_df[col].fillna(0, inplace=True)
     logging.info("Missing values filled.")
@@ -155,14 +148,15 @@ def STROI(config):
     logging.info("NA check passed.")
 
     # Grouping
-    str_lst_groupby = [col for col in st_rroi_df.columns if st_rroi_df[col].dtype == 'object' or col in ['Year', 'Month']]
-    st_rroi_df = st_rroi_df.groupby(str_lst_groupby).sum().reset_index()
+    str_lst_groupby = [col for col in st_rroi_df.columns if is_dimension(st_rroi_df[col]) or col in ['Year', 'Month']]
+    st_rroi_df = st_rroi_df.groupby(str_lst_groupby, observed=True).sum().reset_index()
     st_rroi_df = st_rroi_df.replace("None", np.nan)
     logging.info(f"Data grouped by {str_lst_groupby}, new shape: {st_rroi_df.shape}")
     print(f"Grouped ST ROI: {st_rroi_df.shape}")
 
     # Merge LT and ST
-    final_rroi = pd.merge(left=req_format_lt, right=st_rroi_df, on=str_lst_groupby, how='outer')
+    granularity_cols = [col for col in str_lst_groupby if col not in ['Year', 'Month']]
+    final_rroi = merge_on_granularity(req_format_lt, st_rroi_df, on=str_lst_groupby, columns=granularity_cols, how='outer')
     logging.info(f"Merged LT & ST ROI, final shape: {final_rroi.shape}")
     print(f"Merged LT & ST: {final_rroi.shape}")
 
@@ -200,9 +194,9 @@ def STROI(config):
 
     # Save output
     output_path = f"./output/ensemble_results/final_rroi_{config['brand']}_edited.xlsx"
-    final_rroi.to_excel(output_path, index=False)
-    print(f"Final RROI saved at {output_path}, shape: {final_rroi.shape}")
-    logging.info(f"Final RROI saved at {output_path}, shape: {final_rroi.shape}")
+    save_artifact(context, final_rroi, output_path)
+    print(f"Stored artifact {output_path}, shape: {final_rroi.shape}")
+    logging.info(f"Stored final RROI artifact {output_path}, shape: {final_rroi.shape}")
     logging.info("STROI processing completed successfully.")
     logging.info("-" * 100)
 
@@ -14,39 +14,56 @@ try:
 except Exception as e:
     print("Some Issue in creating log file:", e)
 
-from Weekly_ROI_Results_4 import weekly_results
+from Weekly_ROI_Results_4 import monthly_daily_results
 from STROI_8_Part1 import STROI
+from granularity import GRANULARITY_COLS, granularity_columns, merge_on_granularity, split_granularity
+from reshape import wide_to_long
+from run_context import load_artifact, workspace_path
+from artifact_store import save_deliverable
 
 
 def transform_dataframe(df, config):
     """Transform dataframe into required format based on KPI."""
     kpi = config.get('kpi_name', 'Unknown_KPI')
     df['Date'] = pd.to_datetime(df['Date'])
-    for col in df.columns:
-        col_split = col.split("|")
-        if 'effect_essence' in col_split:
-            col_split = col_split[:-2]
-        if 'Impressions' in col_split:
-            col_split.remove("Impressions")
-        if 'Cost' in col_split:
-            col_split.remove("Cost")
-        df.rename(columns={col: "|".join(col_split)}, inplace=True)
-
-    df.set_index('Date', inplace=True)
-    transformed_df = pd.DataFrame(df.T.unstack()).reset_index()
-    transformed_df.rename({'level_1': "Merged Granularity", 0: f'{kpi}'}, axis=1, inplace=True)
+
+    transformed_df = wide_to_long(df, f'{kpi}')
 
     logging.info("Dataframe transformed successfully in transform_dataframe().")
     return transformed_df
 
 
-def finalize_rroi(config):
+# column of final_rroi -> column of the monthly daily totals that can override it
+DAILY_OVERRIDES = {"Cost": "daily_cost", "Impression": "daily_imp"}
+
+
+def apply_daily_overrides(df, sources):
+    """Overwrite Cost/Impression in place wherever the daily files have a value.
+
+    `sources` maps a column to "daily" (default, the daily file wins) or
+    "st_rroi" (the ST-RROI value is kept). Returns the cells overridden per column.
+    """
+    overridden = {}
+    for column, daily_col in DAILY_OVERRIDES.items():
+        source = sources.get(column, "daily")
+        if source not in ("daily", "st_rroi"):
+            raise ValueError(f"Config error: cost_imp_source for '{column}' must be 'daily' or 'st_rroi', got '{source}'")
+        if source == "st_rroi":
+            overridden[column] = 0
+            continue
+        mask = df[daily_col].notna()
+        df[column] = df[column].mask(mask, df[daily_col])
+        overridden[column] = int(mask.sum())
+    return overridden
+
+
+def finalize_rroi(config, context=None):
     output_path = f"./output/ensemble_results/final_rroi_{config['brand']}_edited.xlsx"
     logging.info(f"Starting finalize_rroi for brand: {config['brand']}")
     logging.info(f"Reading final_rroi from: {output_path}")
 
     try:
-        final_rroi = pd.read_excel(output_path)
+        final_rroi = load_artifact(context, output_path)
         logging.info(f"final_rroi loaded with shape {final_rroi.shape}")
         print(f"Loaded final_rroi with {final_rroi.shape[0]} rows and {final_rroi.shape[1]} columns")
     except Exception as e:
@@ -71,43 +88,33 @@ def finalize_rroi(config):
             print(f"Zeroed expected values for {affected_rows} rows (Cost=0 & Impression=0)")
 
             output_file = f"./output/Extrapolated Data/final_st_lt_rroi_{config['brand']}-{config['curr_date']}.xlsx"
-            final_rroi.to_excel(output_file, index=False)
+            save_deliverable(final_rroi, workspace_path(context, output_file))
             logging.info(f"Saved final file (no daily adjustments) at {output_file}")
             print(f"Final file saved at {output_file}")
 
         else:
-            logging.info("Daily adjustments enabled. Starting merge with weekly results.")
+            logging.info("Daily adjustments enabled. Starting merge with monthly daily cost/impressions.")
             final_rroi_updated = final_rroi.copy()
             temp_lst = ['daily_cost', 'daily_imp']
 
-            final_dict = weekly_results(config)
-            print(final_dict)
-            logging.info("final_dict",final_dict)
-            logging.info("Weekly results successfully retrieved from weekly_results().")
-
             for ci in temp_lst:
-                try:
-                    new_cost_imp = final_dict[ci].copy()
-                    logging.info(f"Processing {ci} data with shape {new_cost_imp.shape}")
-                    print(f"Processing {ci} data → {new_cost_imp.shape}")
-                except KeyError:
-                    logging.warning(f"{ci} not found in weekly_results. Skipping.")
+                # Daily file summed to Year/Month per granularity (computed once per run)
+                new_cost_imp = monthly_daily_results(config, ci, context)
+                if new_cost_imp is None:
+                    logging.warning(f"{ci} not found in the input catalog. Skipping.")
                     continue
+                logging.info(f"Processing {ci} data with shape {new_cost_imp.shape}")
+                print(f"Processing {ci} data → {new_cost_imp.shape}")
 
-                # Preprocessing
-                new_cost_imp['Year'] = new_cost_imp['Date'].dt.year
-                new_cost_imp['Month'] = new_cost_imp['Date'].dt.month
-                new_cost_imp.drop(columns=['Date'], inplace=True)
-                new_cost_imp = new_cost_imp.groupby(['Merged Granularity','Year','Month']).sum().reset_index()
                 assert new_cost_imp.isna().sum().sum() == 0, f"NaNs found in {ci} data after grouping"
 
                 # Split Merged Granularity based on ProductLine_Flag
-                if config["ProductLine_Flag"] == 1:
-                    new_cost_imp[["Media Type", "Product Line", "Master Channel", "Channel", "Platform"]] = new_cost_imp["Merged Granularity"].str.split("|", expand=True)
-                elif config["ProductLine_Flag"] == 2:
-                    new_cost_imp[["Media Type", "Product Line", "Master Channel", "Channel"]] = new_cost_imp["Merged Granularity"].str.split("|", expand=True)
+                if config["ProductLine_Flag"] in (1, 2):
+                    granularity_cols = granularity_columns(config["ProductLine_Flag"])
                 else:
-                    new_cost_imp[["Media Type", "Master Channel", "Channel/Daypart", "Platform"]] = new_cost_imp["Merged Granularity"].str.split("|", expand=True)
+                    granularity_cols = ["Media Type", "Master Channel", "Channel/Daypart", "Platform"]
+                new_cost_imp[granularity_cols] = split_granularity(new_cost_imp["Merged Granularity"], granularity_cols)
+                if config["ProductLine_Flag"] not in (1, 2):
                     new_cost_imp["Product Line"] = "ALL"
                 new_cost_imp.drop(columns=["Merged Granularity"], inplace=True)
                 logging.info(f"{ci} granularity columns split successfully.")
@@ -140,27 +147,24 @@ def finalize_rroi(config):
                     print("Kraken brand logic executing")
 
                 # Merge into final_rroi
-                final_rroi_updated = pd.merge(
-                    left=final_rroi_updated,
-                    right=new_cost_imp,
-                    on=['Media Type','Product Line','Master Channel','Channel','Platform','Year','Month'],
+                final_rroi_updated = merge_on_granularity(
+                    final_rroi_updated,
+                    new_cost_imp,
+                    on=GRANULARITY_COLS + ['Year','Month'],
+                    columns=GRANULARITY_COLS,
                     how='left'
                 )
                 logging.info(f"Merged {ci} data into final_rroi. Shape now {final_rroi_updated.shape}")
                 print(f"Merged {ci} → final_rroi now {final_rroi_updated.shape}")
 
             # Assign values if available
-            def assign_values(row):
-                if 'daily_cost' in row and pd.notna(row['daily_cost']):
-                    row['Cost'] = row['daily_cost']
-                if 'daily_imp' in row and pd.notna(row['daily_imp']):
-                    row['Impression'] = row['daily_imp']
-                return row
-
             if 'daily_cost' in final_rroi_updated.columns and 'daily_imp' in final_rroi_updated.columns:
-                final_rroi_updated = final_rroi_updated.apply(assign_values, axis=1)
-                logging.info("Reassigned Cost/Impression from daily_cost/daily_imp.")
-                print("Applied daily_cost & daily_imp overrides.")
+                overridden = apply_daily_overrides(final_rroi_updated, config.get("cost_imp_source", {}))
+                if context is not None:
+                    for column, cells in overridden.items():
+                        context.record("override", column, final_rroi_updated, cells=cells)
+                logging.info(f"Reassigned Cost/Impression from daily_cost/daily_imp, cells overridden: {overridden}")
+                print(f"Applied daily_cost & daily_imp overrides: {overridden}")
 
             expected_columns = [col for col in final_rroi_updated.columns if 'expected' in col.lower()]
             logging.info(f"Expected columns identified: {expected_columns}")
@@ -179,7 +183,7 @@ def finalize_rroi(config):
 
             # Save file
             output_file = f"./output/Extrapolated Data/final_st_lt_rroi_{config['brand']}-{config['curr_date']}.xlsx"
-            final_rroi_updated.to_excel(output_file, index=False)
+            save_deliverable(final_rroi_updated, workspace_path(context, output_file))
             logging.info(f"Saved adjusted final_rroi at {output_file}")
             print(f"Final adjusted file saved at {output_file}")
 
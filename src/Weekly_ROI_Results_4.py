@@ -8,6 +8,15 @@ from datetime import datetime
 from dateutil.relativedelta import relativedelta
 import json
 
+from granularity import granularity_columns, split_granularity
+from input_catalog import catalog_path, has_input, load_input
+from metric_pool import map_metrics
+from reshape import wide_to_long
+from run_context import artifact_name, has_artifact, load_artifact, save_artifact
+
+# catalog role of each daily input
+DAILY_ROLES = {"daily_cost": "Daily_Cost", "daily_imp": "Daily_Impressions"}
+
 logging.basicConfig(
     filename='./output/logs/weekly_roi_results.log',
     level=logging.INFO,
@@ -15,11 +24,52 @@ logging.basicConfig(
 )
 
 
-def weekly_results(config):
-    results_dict = {}
-    metrics_list = config.get("metrics", [])
-    metrics_list.append("Pure_Baseline")
+def metric_input_files(config, metrics):
+    """Attribute name -> weekly KPI workbook (read at the sheet of that name) for one non-baseline metric."""
+    return {
+        kpi_name: f"./input/Data/LTROI {config['brand']} Weekly {metrics}.xlsx"
+        for kpi_name in config.get("pure_baseline", {}).values()
+    }
+
+
+def metric_input_roles(metrics):
+    """Attribute name -> catalog role of the ingested tables one non-baseline metric reads."""
+    return {
+        "Impressions": "Impressions_unlagged",
+        "Weighted Impressions": f"Impressions_lagged_{metrics}",
+        "daily_imp": DAILY_ROLES["daily_imp"],
+        "daily_cost": DAILY_ROLES["daily_cost"],
+    }
 
+
+def metric_artifacts(config, metrics):
+    """Artifact names one metric reads, so a worker process only receives those."""
+    baseline_kpis = config.get("pure_baseline", {})
+    if metrics == "Pure_Baseline":
+        return [artifact_name(f"./input/Data/mds_{kpi_key}.xlsx") for kpi_key in baseline_kpis]
+    return [
+        artifact_name(file_path, attr_type) for attr_type, file_path in metric_input_files(config, metrics).items()
+    ] + [
+        artifact_name(catalog_path(config['brand'], role)) for role in metric_input_roles(metrics).values()
+    ]
+
+
+def load_metric_input(config, metrics, attr_type, context):
+    """Weekly input `attr_type` of one metric, from its KPI workbook or the input catalog; None when missing."""
+    role = metric_input_roles(metrics).get(attr_type)
+    if role is not None:
+        if not has_input(context, config['brand'], role):
+            return None
+        return load_input(context, config['brand'], role)
+
+    file_path = metric_input_files(config, metrics)[attr_type]
+    if not has_artifact(context, file_path, attr_type):
+        return None
+    return load_artifact(context, file_path, attr_type)
+
+
+def metric_weekly_results(config, metrics, context):
+    """Long-format weekly results of one metric; returns its per-attribute frames."""
     # Define KPIs for baseline
     baseline_kpis = config.get("pure_baseline", {})
 
@@ -27,161 +77,148 @@ def weekly_results(config):
     roi_numerator = config.get("roi_base_metric", "Weekly sales")
     roi_denominator = "Weighted Impressions" 
 
-    for metrics in metrics_list:
-
-        if metrics == "Pure_Baseline":
-            pure_base_dict = {}
-
-            for kpi_key, kpi_name in baseline_kpis.items():
-                logging.info(f"Checking wether pure_baseline is connecting or not {kpi_key}")
-                baseline_file = f"./input/Data/mds_{kpi_key}.xlsx"
-                if not os.path.exists(baseline_file):
-                    logging.warning(f"Baseline file {baseline_file} not found. Skipping {kpi_key}.")
-                    continue
-
-                weekly_data = pd.read_excel(baseline_file)[["Date", "Baseline"]]
-                weekly_data["Date"] = pd.to_datetime(weekly_data["Date"], format=config["date_format"])
-                weekly_data.rename(columns={"Baseline": "Pure_Baseline"}, inplace=True)
-                weekly_data.set_index('Date', inplace=True)
-                weekly_data_t = weekly_data.T
-                final = pd.DataFrame(weekly_data_t.unstack()).reset_index()
-                final.rename({'level_1': "Metrics", 0: f"{kpi_name}"}, axis=1, inplace=True)
-                pure_base_dict[kpi_key] = final.copy()
-
-            if pure_base_dict:
-                # Merge all KPI dataframes dynamically
-                pure_base_df = None
-                for i, df in enumerate(pure_base_dict.values()):
-                    if i == 0:
-                        pure_base_df = df
-                    else:
-                        pure_base_df = pd.merge(pure_base_df, df, on=["Date", "Metrics"], how="left")
-
-                output_path = f'./output/Weekly ROI Format/{config["brand"]}_{metrics}_Weekly_results.xlsx'
-                pure_base_df.to_excel(output_path, index=False)
-                logging.info(f"Saved Pure Baseline results to {output_path}")
-            continue
+    if metrics == "Pure_Baseline":
+        pure_base_dict = {}
 
-        # For MFI, DFI, SFI (or any metric)
-        attr_dict = {}
-
-        # Add KPI-specific files dynamically
         for kpi_key, kpi_name in baseline_kpis.items():
-            attr_dict[kpi_name] = f"./input/Data/LTROI {config['brand']} Weekly {metrics}.xlsx"
-
-        # Add standard files
-        attr_dict.update({
-            "Impressions": f"./input/Data/{config['brand']}_Impressions_unlagged.xlsx",
-            "Weighted Impressions": f"./input/Data/{config['brand']}_Impressions_lagged_{metrics}.xlsx",
-            "daily_imp": f"./input/Data/{config['brand']}_Daily_Impressions.xlsx",
-            "daily_cost": f"./input/Data/{config['brand']}_Daily_Cost.xlsx"
-        })
-
-        final_dict = {}
-
-        for attr_type, file_path in attr_dict.items():
-            if not os.path.exists(file_path):
-                logging.warning(f"File {file_path} not found for {attr_type}. Skipping.")
+            logging.info(f"Checking wether pure_baseline is connecting or not {kpi_key}")
+            baseline_file = f"./input/Data/mds_{kpi_key}.xlsx"
+            if not has_artifact(context, baseline_file):
+                logging.warning(f"Baseline file {baseline_file} not found. Skipping {kpi_key}.")
                 continue
 
-            # If KPI-specific sheet name exists, read it, else normal
-            try:
-                if attr_type in baseline_kpis.values():
-                    weekly_data = pd.read_excel(file_path, sheet_name=attr_type)
+            weekly_data = load_artifact(context, baseline_file)[["Date", "Baseline"]]
+            weekly_data["Date"] = pd.to_datetime(weekly_data["Date"], format=config["date_format"])
+            weekly_data.rename(columns={"Baseline": "Pure_Baseline"}, inplace=True)
+            final = wide_to_long(weekly_data, f"{kpi_name}", var_name="Metrics", normalize=False)
+            pure_base_dict[kpi_key] = final.copy()
+
+        if pure_base_dict:
+            # Merge all KPI dataframes dynamically
+            pure_base_df = None
+            for i, df in enumerate(pure_base_dict.values()):
+                if i == 0:
+                    pure_base_df = df
                 else:
-                    weekly_data = pd.read_excel(file_path)
-            except Exception as e:
-                logging.error(f"Error reading {file_path}: {e}")
-                continue
+                    pure_base_df = pd.merge(pure_base_df, df, on=["Date", "Metrics"], how="left")
 
-            weekly_data.fillna(0, inplace=True)
-            weekly_data['Date'] = pd.to_datetime(weekly_data['Date'], format=config["date_format"])
-
-            # Clean column names
-            # for col in weekly_data.columns:
-            #     if 'effect_essence' in col:
-            #         weekly_data.rename(columns={col: "|".join(col.split('|')[:-2])}, inplace=True)
-            #     if 'Impressions' in col or 'Cost' in col:
-            #         col_list = col.split('|')
-            #         col_list = [c for c in col_list if c not in ["Impressions", "Cost"]]
-            #         weekly_data.rename(columns={col: "|".join(col_list)}, inplace=True)
-
-            rename_map = {}
-            for col in weekly_data.columns:
-                new_col = col
-                if 'effect_essence' in col:
-                    parts = col.split('|')[:-2] 
-                    new_col = "|".join(parts)
-
-                if 'Impressions' in new_col or 'Cost' in new_col:
-                    parts = [c for c in new_col.split('|') if c not in ["Impressions", "Cost"]]
-                    new_col = "|".join(parts)
-
-                if new_col != col:
-                    rename_map[col] = new_col
-
-            if rename_map:
-                weekly_data.rename(columns=rename_map, inplace=True)
-
-            weekly_data.set_index('Date', inplace=True)
-            weekly_data_t = weekly_data.T
-            final_dict[attr_type] = pd.DataFrame(weekly_data_t.unstack()).reset_index()
-            final_dict[attr_type].rename({'level_1': "Merged Granularity", 0: f"{attr_type}"}, axis=1, inplace=True)
-            output_attr_path = f'./output/Weekly ROI Format/LT_{attr_type}_{metrics}.xlsx'
-            final_dict[attr_type].to_excel(output_attr_path, sheet_name=attr_type, index=False)
-
-        merged_final = None
-        for i, kpi_name in enumerate(baseline_kpis.values()):
-            if kpi_name in final_dict:
-                if merged_final is None:
-                    merged_final = final_dict[kpi_name]
-                else:
-                    merged_final = pd.merge(merged_final, final_dict[kpi_name], on=['Date', 'Merged Granularity'], how='inner')
+            output_path = f'./output/Weekly ROI Format/{config["brand"]}_{metrics}_Weekly_results.xlsx'
+            save_artifact(context, pure_base_df, output_path)
+            logging.info(f"Saved Pure Baseline results to {output_path}")
+        return None
+
+    # For MFI, DFI, SFI (or any metric)
+    attr_types = list(metric_input_files(config, metrics)) + list(metric_input_roles(metrics))
 
-        if merged_final is None:
-            logging.warning(f"No KPI data found for {metrics}. Skipping merge.")
+    final_dict = {}
+
+    for attr_type in attr_types:
+        # KPI sheets come from the weekly workbook, the other inputs from the catalog
+        try:
+            weekly_data = load_metric_input(config, metrics, attr_type, context)
+        except Exception as e:
+            logging.error(f"Error reading {attr_type} for {metrics}: {e}")
+            continue
+        if weekly_data is None:
+            logging.warning(f"Input {attr_type} not found for {metrics}. Skipping.")
             continue
 
-        prev_dates = list(pd.date_range(config["expected_sales_start"], config["model_start_date"], freq='W-SUN'))
-        df_prev = pd.DataFrame(columns=merged_final.columns)
+        weekly_data.fillna(0, inplace=True)
+        weekly_data['Date'] = pd.to_datetime(weekly_data['Date'], format=config["date_format"])
+
+        # Clean column names (effect_essence / Impressions / Cost parts) and melt to long format
+        final_dict[attr_type] = wide_to_long(weekly_data, f"{attr_type}")
+        output_attr_path = f'./output/Weekly ROI Format/LT_{attr_type}_{metrics}.xlsx'
+        save_artifact(context, final_dict[attr_type], output_attr_path, sheet_name=attr_type)
+
+    merged_final = None
+    for i, kpi_name in enumerate(baseline_kpis.values()):
+        if kpi_name in final_dict:
+            if merged_final is None:
+                merged_final = final_dict[kpi_name]
+            else:
+                merged_final = pd.merge(merged_final, final_dict[kpi_name], on=['Date', 'Merged Granularity'], how='inner')
+
+    if merged_final is None:
+        logging.warning(f"No KPI data found for {metrics}. Skipping merge.")
+        return final_dict
+
+    prev_dates = list(pd.date_range(config["expected_sales_start"], config["model_start_date"], freq='W-SUN'))
+    df_prev = pd.DataFrame(columns=merged_final.columns)
+
+    for i in prev_dates:
+        df_temp = merged_final[merged_final["Date"] == config["model_end_date"]].reset_index(drop=True)
+        df_temp["Date"] = i
+        for col in baseline_kpis.values():
+            if col in df_temp.columns:
+                df_temp[col] = 0
+        df_prev = pd.concat([df_prev, df_temp], axis=0).reset_index(drop=True)
+
+    merged_final = pd.concat([df_prev, merged_final], axis=0).reset_index(drop=True)
+
+    for extra in ["Impressions", "Weighted Impressions"]:
+        if extra in final_dict:
+            merged_final = pd.merge(merged_final, final_dict[extra], on=["Date", "Merged Granularity"], how="left")
+
+    # ROI Calculation
+    merged_final["Actual ROI"] = 0.0
+    if roi_numerator in merged_final.columns and roi_denominator in merged_final.columns:
+        non_zero_mask = merged_final[roi_denominator] != 0
+        merged_final.loc[non_zero_mask, "Actual ROI"] = merged_final.loc[non_zero_mask, roi_numerator] / merged_final.loc[non_zero_mask, roi_denominator]
+
+    granularity_cols = granularity_columns(config["ProductLine_Flag"])
+    merged_final[granularity_cols] = split_granularity(merged_final["Merged Granularity"], granularity_cols)
+    if config["ProductLine_Flag"] not in (1, 2):
+        merged_final["Product Line"] = "ALL"
+
+    merged_final.drop(columns=["Merged Granularity"], inplace=True)
+
+    output_path = f"./output/Weekly ROI Format/{config['brand']}_{metrics}_Weekly_results.xlsx"
+    save_artifact(context, merged_final, output_path)
+    logging.info(f"Saved weekly results for {metrics} at {output_path}")
+
+    # print(merged_final)
+    return final_dict
 
-        for i in prev_dates:
-            df_temp = merged_final[merged_final["Date"] == config["model_end_date"]].reset_index(drop=True)
-            df_temp["Date"] = i
-            for col in baseline_kpis.values():
-                if col in df_temp.columns:
-                    df_temp[col] = 0
-            df_prev = pd.concat([df_prev, df_temp], axis=0).reset_index(drop=True)
 
-        merged_final = pd.concat([df_prev, merged_final], axis=0).reset_index(drop=True)
+def monthly_daily_results(config, attr_type, context=None):
+    """Monthly long table (Merged Granularity, Year, Month, attr_type) of a daily wide input.
 
-        for extra in ["Impressions", "Weighted Impressions"]:
-            if extra in final_dict:
-                merged_final = pd.merge(merged_final, final_dict[extra], on=["Date", "Merged Granularity"], how="left")
+    `attr_type` is "daily_cost" or "daily_imp". The daily table is summed to
+    months while still wide and only the monthly table is melted, so the
+    daily-by-granularity long table is never built. The result is kept in the
+    run context and reused by later calls in the same run.
+    """
+    output_path = f"./output/Weekly ROI Format/{config['brand']}_monthly_{attr_type}.xlsx"
+    if context is not None and artifact_name(output_path) in context:
+        return load_artifact(context, output_path)
 
-        # ROI Calculation
-        merged_final["Actual ROI"] = 0.0
-        if roi_numerator in merged_final.columns and roi_denominator in merged_final.columns:
-            non_zero_mask = merged_final[roi_denominator] != 0
-            merged_final.loc[non_zero_mask, "Actual ROI"] = merged_final.loc[non_zero_mask, roi_numerator] / merged_final.loc[non_zero_mask, roi_denominator]
+    role = DAILY_ROLES[attr_type]
+    if not has_input(context, config['brand'], role):
+        logging.warning(f"Input {catalog_path(config['brand'], role)} not found for {attr_type}. Skipping.")
+        return None
 
-        if config["ProductLine_Flag"] == 1:
-            merged_final[["Media Type", "Product Line", "Master Channel", "Channel", "Platform"]] = merged_final["Merged Granularity"].str.split("|", expand=True)
-        elif config["ProductLine_Flag"] == 2:
-            merged_final[["Media Type", "Product Line", "Master Channel", "Channel"]] = merged_final["Merged Granularity"].str.split("|", expand=True)
-        else:
-            merged_final[["Media Type", "Master Channel", "Channel", "Platform"]] = merged_final["Merged Granularity"].str.split("|", expand=True)
-            merged_final["Product Line"] = "ALL"
+    daily_data = load_input(context, config['brand'], role)
+    daily_data.fillna(0, inplace=True)
+    dates = pd.to_datetime(daily_data.pop('Date'), format=config["date_format"])
+    monthly_data = daily_data.groupby([dates.dt.year.rename('Year'), dates.dt.month.rename('Month')]).sum().reset_index()
+    logging.info(f"Summed {attr_type} from {len(daily_data)} days to {len(monthly_data)} months")
 
-        merged_final.drop(columns=["Merged Granularity"], inplace=True)
+    monthly = wide_to_long(monthly_data, f"{attr_type}", id_col=['Year', 'Month'])
+    monthly = monthly.groupby(['Merged Granularity', 'Year', 'Month'], observed=True).sum().reset_index()
+    save_artifact(context, monthly, output_path)
+    return monthly
 
-        output_path = f"./output/Weekly ROI Format/{config['brand']}_{metrics}_Weekly_results.xlsx"
-        merged_final.to_excel(output_path, index=False)
-        logging.info(f"Saved weekly results for {metrics} at {output_path}")
 
-        results_dict[metrics] = merged_final
+def weekly_results(config, context=None):
+    metrics_list = list(config.get("metrics", []))
+    metrics_list.append("Pure_Baseline")
 
-        # print(merged_final)
+    results = map_metrics(metric_weekly_results, metrics_list, config, context, inputs=lambda m: metric_artifacts(config, m))
+    final_dict = {}
+    for metric_final_dict in results:
+        if metric_final_dict is not None:
+            final_dict = metric_final_dict
 
     logging.info("All metrics processed successfully.")
     # return results_dict,final_dict
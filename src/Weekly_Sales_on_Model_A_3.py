@@ -8,101 +8,120 @@ from datetime import date, datetime, timedelta
 from dateutil.relativedelta import relativedelta
 import json
 
+from ensemble_engine import ensemble_average
+from metric_pool import map_metrics
+from run_context import artifact_name, is_stored, load_artifact, save_artifact, save_sheets, workspace_path
+
 logging.basicConfig(
     filename='./output/logs/weekly_sales.log',
     level=logging.INFO,
     format='%(asctime)s:%(levelname)s:%(message)s'
 )
 
-def weekly_sales(config):
+def ensemble_metric(config, modelA, context, mds_kpi, all_date_weekly):
+    """Ensemble the Model A runs of one metric and split it per KPI."""
+    all_date_weekly_df = pd.DataFrame({"Date": all_date_weekly})
+    if not config[modelA]:
+        raise ValueError(f"Config error: '{modelA}' is empty. Please add models to config.")
+    members = config[modelA]
+    weights = config.get("ensemble_weights", {}).get(modelA)
+    if weights is not None and len(weights) != len(members):
+        raise ValueError(f"Config error: 'ensemble_weights' for '{modelA}' has {len(weights)} entries for {len(members)} models.")
+
+    member_paths = [f"{config['modelA_s3_folder_path']}/raw_abs_{config['brand']}_{model}.csv" for model in members]
+    ensemble_workers = config.get("ensemble_workers", 1)
+    # members the run already holds (or the store wrote) are loaded in-process, raw CSVs may be parsed in a pool
+    sources = [
+        (lambda path=path: load_artifact(context, path)) if ensemble_workers <= 1 or is_stored(context, path)
+        else workspace_path(context, path)
+        for path in member_paths
+    ]
+    pooled = {path for path, source in zip(member_paths, sources) if isinstance(source, str)}
+
+    def record_member(path, member):
+        # parses done in the pool bypass load_artifact, log them for the run report here
+        if context is not None and path in pooled:
+            context.record("read", artifact_name(path), member, os.path.getsize(workspace_path(context, path)))
+        logging.info(f"Loaded: {path}")
+
+    try:
+        df, dates = ensemble_average(sources, config["date_format"], weights, member_paths, ensemble_workers, record_member)
+        logging.info(f"Averaged {len(members)} models for {modelA}")
+    except KeyError:
+        logging.error(f"Column mismatch in Model A files for {modelA}", exc_info=True)
+        raise
+    except Exception as e:
+        logging.error(f"Error loading or averaging Model A files for {modelA}", exc_info=True)
+        raise
+
+    try:
+        df = df.div(df.sum(axis=1), axis=0)
+        df.insert(0, 'Date', dates)
+        df = pd.merge(all_date_weekly_df, df, on="Date", how="left")
+        assert df.isna().sum().sum() == 0, f"{modelA} has missing values"
+        assert len(df) == len(all_date_weekly), f"{modelA} has repeated/missing dates"
+        logging.info(f"{modelA} ensemble data processed and validated.")
+    except AssertionError as ae:
+        logging.error(f"Validation failed for {modelA}: {str(ae)}")
+        raise
+    except Exception as e:
+        logging.error(f"Error during ensemble processing for {modelA}", exc_info=True)
+        raise
+
+    try:
+        # ensemble_file_name = f'./output/ensemble_results/raw_abs_{config["brand"]}_{modelA[:3]}_Ensemble.csv'
+        ensemble_file_name = f'./output/ensemble_results/raw_abs_{config["brand"]}_{modelA}_Ensemble.csv'
+        save_artifact(context, df, ensemble_file_name)
+        print("Stored artifact :", ensemble_file_name)
+        logging.info(f"Stored ensemble artifact: {ensemble_file_name}")
+    except Exception as e:
+        logging.error(f"Failed to save ensemble file for {modelA}", exc_info=True)
+        raise
+
+    # file_path = f'./input/Data/LTROI {config["brand"]} Weekly {modelA[:3]}.xlsx'
+    file_path = f'./input/Data/LTROI {config["brand"]} Weekly {modelA}.xlsx'
+    kpi_sheets = {}
+    for l_temp in mds_kpi.keys():
+        try:
+            # df_bu = df.drop(columns=['Date']).multiply(mds_kpi[l_temp][modelA[:3]], axis=0)
+            df_bu = df.drop(columns=['Date']).multiply(mds_kpi[l_temp][modelA], axis=0)
+            df_bu.insert(0, 'Date', all_date_weekly)
+            kpi_sheets[f"Weekly {l_temp}"] = df_bu
+        except Exception as e:
+            logging.error(f"Failed to build LTROI sheet for {modelA} - {l_temp}", exc_info=True)
+            raise
+
+    try:
+        save_sheets(context, kpi_sheets, file_path)
+        logging.info(f"Stored LTROI weekly sheets for {modelA}: {list(kpi_sheets)}")
+    except Exception as e:
+        logging.error(f"Failed to save LTROI sheets for {modelA}", exc_info=True)
+        raise
+
+    return df_bu
+
+
+def weekly_sales(config, context=None):
     try:
         all_date_weekly = pd.date_range(start=config["model_start_date"], end=config["model_end_date"], freq='W')
-        all_date_weekly_df = pd.DataFrame({"Date": all_date_weekly})
         mds_kpi = {}
 
         for l_temp in config["kpi"].keys():
             try:
-                mds_kpi[l_temp] = pd.read_excel(f"./input/Data/mds_{l_temp}.xlsx")
+                mds_kpi[l_temp] = load_artifact(context, f"./input/Data/mds_{l_temp}.xlsx")
                 logging.info(f"KPI file loaded for {l_temp}")
             except Exception as e:
                 logging.error(f"Error loading KPI file for {l_temp}", exc_info=True)
                 raise
 
-        for modelA in config['metrics']: ### From Here 
-            if not config[modelA]:
-                raise ValueError(f"Config error: '{modelA}' is empty. Please add models to config.")
-            try:
-                base_model = config[modelA][0]
-                df = pd.read_csv(f"{config['modelA_s3_folder_path']}/raw_abs_{config['brand']}_{base_model}.csv")  ### Till Here it is edited accordinf to requirement
-                df["Date"] = pd.to_datetime(df["Date"], format=config["date_format"])
-                logging.info(f"Loaded: raw_abs_{base_model}")
-                df.drop('Date', axis=1, inplace=True)
-            except Exception as e:
-                logging.error(f"Error loading or parsing base model file for {modelA}", exc_info=True)
-                raise
-
-            if len(config[modelA]) > 1:
-                for model in range(1, len(config[modelA])):
-                    try:
-                        model_name = config[modelA][model]
-                        df1 = pd.read_csv(f"{config['modelA_s3_folder_path']}/raw_abs_{config['brand']}_{model_name}.csv")
-                        df1["Date"] = pd.to_datetime(df1["Date"], format=config["date_format"])
-                        df1 = df1[["Date"] + list(df.columns)]  # Ensure consistent column order
-                        df = df.add(df1.drop('Date', axis=1))
-                        print(f'raw_abs_{config[modelA][model]}')
-                        logging.info(f"Loaded and added: raw_abs_{model_name}")
-                    except KeyError:
-                        logging.error(f"Column mismatch in file: raw_abs_{model_name}", exc_info=True)
-                        raise
-                    except Exception as e:
-                        logging.error(f"Error processing model file: raw_abs_{model_name}", exc_info=True)
-                        raise
-
-            try:
-                df = df / len(config[modelA])
-                df = df.div(df.sum(axis=1), axis=0)
-                df.insert(0, 'Date', df1['Date'])
-                df = pd.merge(all_date_weekly_df, df, on="Date", how="left")
-                assert df.isna().sum().sum() == 0, f"{modelA} has missing values"
-                assert len(df) == len(all_date_weekly), f"{modelA} has repeated/missing dates"
-                logging.info(f"{modelA} ensemble data processed and validated.")
-            except AssertionError as ae:
-                logging.error(f"Validation failed for {modelA}: {str(ae)}")
-                raise
-            except Exception as e:
-                logging.error(f"Error during ensemble processing for {modelA}", exc_info=True)
-                raise
-
-            try:
-                # ensemble_file_name = f'./output/ensemble_results/raw_abs_{config["brand"]}_{modelA[:3]}_Ensemble.csv'
-                ensemble_file_name = f'./output/ensemble_results/raw_abs_{config["brand"]}_{modelA}_Ensemble.csv'
-                df.to_csv(ensemble_file_name, index=False)
-                print("Saved to :", ensemble_file_name)
-                logging.info(f"Saved ensemble file: {ensemble_file_name}")
-            except Exception as e:
-                logging.error(f"Failed to save ensemble file for {modelA}", exc_info=True)
-                raise
+        ensemble_files = lambda modelA: [
+            artifact_name(f"{config['modelA_s3_folder_path']}/raw_abs_{config['brand']}_{model}.csv")
+            for model in config[modelA]
+        ]
+        results = map_metrics(ensemble_metric, config['metrics'], config, context,
+                              inputs=ensemble_files, args=(mds_kpi, all_date_weekly))
+        df_bu = results[-1]
 
-            ct = 0
-            for l_temp in mds_kpi.keys():
-                try:
-                    # df_bu = df.drop(columns=['Date']).multiply(mds_kpi[l_temp][modelA[:3]], axis=0)
-                    df_bu = df.drop(columns=['Date']).multiply(mds_kpi[l_temp][modelA], axis=0)
-                    df_bu.insert(0, 'Date', all_date_weekly)
-
-                    # file_path = f'./input/Data/LTROI {config["brand"]} Weekly {modelA[:3]}.xlsx'
-                    file_path = f'./input/Data/LTROI {config["brand"]} Weekly {modelA}.xlsx'
-                    if ct == 0:
-                        df_bu.to_excel(file_path, sheet_name=f"Weekly {l_temp}", index=False)
-                    else:
-                        with pd.ExcelWriter(file_path, engine='openpyxl', mode='a', if_sheet_exists='replace') as writer:
-                            df_bu.to_excel(writer, sheet_name=f"Weekly {l_temp}", index=False)
-                    logging.info(f"Saved LTROI weekly sheet for {modelA} - {l_temp}")
-                    ct += 1
-                except Exception as e:
-                    logging.error(f"Failed to save LTROI sheet for {modelA} - {l_temp}", exc_info=True)
-                    raise
-                
         logging.info(f"-"*100)
         return df_bu
 
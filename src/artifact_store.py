@@ -0,0 +1,170 @@
+import os
+import shutil
+import logging
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+try:
+    import python_calamine  # noqa: F401
+    HAS_CALAMINE = True
+except ImportError:
+    HAS_CALAMINE = False
+
+
+class ArtifactStore:
+    """Reads and writes inter-stage artifacts in a single on-disk format.
+
+    Stages keep addressing artifacts by their historical `.xlsx`/`.csv` path;
+    the store swaps the suffix for its own format. Files that were never
+    written by the store (user supplied inputs) are read from the original path.
+    """
+
+    suffix = None
+
+    def path_for(self, path, sheet_name=None):
+        base = os.path.splitext(path)[0]
+        if sheet_name:
+            base = f"{base}__{sheet_name}"
+        return base + self.suffix
+
+    def exists(self, path, sheet_name=None):
+        return os.path.exists(self.path_for(path, sheet_name)) or os.path.exists(path)
+
+    def read(self, path, sheet_name=None, **read_kwargs):
+        store_path = self.path_for(path, sheet_name)
+        if os.path.exists(store_path):
+            return self._read(store_path)
+        return read_original(path, sheet_name, **read_kwargs)
+
+    def write(self, df, path, sheet_name=None):
+        store_path = self.path_for(path, sheet_name)
+        detach(store_path)
+        self._write(df, store_path)
+        return store_path
+
+    def write_sheets(self, sheets, path):
+        """Write several `sheet_name: df` artifacts of one workbook; returns the files written."""
+        return [self.write(df, path, sheet_name) for sheet_name, df in sheets.items()]
+
+    def _read(self, path):
+        raise NotImplementedError
+
+    def _write(self, df, path):
+        raise NotImplementedError
+
+
+class ParquetStore(ArtifactStore):
+    suffix = ".parquet"
+
+    def _read(self, path):
+        return pd.read_parquet(path)
+
+    def _write(self, df, path):
+        df.to_parquet(path, index=False)
+
+
+class FeatherStore(ArtifactStore):
+    """Arrow IPC files; fastest to read back, larger on disk than Parquet."""
+
+    suffix = ".arrow"
+
+    def _read(self, path):
+        return pd.read_feather(path)
+
+    def _write(self, df, path):
+        df.reset_index(drop=True).to_feather(path)
+
+
+class ExcelStore(ArtifactStore):
+    """Legacy behaviour: artifacts stay `.xlsx`/`.csv`, one sheet per KPI where requested."""
+
+    def path_for(self, path, sheet_name=None):
+        return path
+
+    def exists(self, path, sheet_name=None):
+        return os.path.exists(path)
+
+    def read(self, path, sheet_name=None, **read_kwargs):
+        return read_original(path, sheet_name, **read_kwargs)
+
+    def write(self, df, path, sheet_name=None):
+        detach(path, keep=sheet_name is not None)
+        if path.endswith(".csv"):
+            df.to_csv(path, index=False)
+        elif sheet_name is not None and os.path.exists(path):
+            with pd.ExcelWriter(path, engine='openpyxl', mode='a', if_sheet_exists='replace') as writer:
+                df.to_excel(writer, sheet_name=sheet_name, index=False)
+        elif sheet_name is not None:
+            df.to_excel(path, sheet_name=sheet_name, index=False)
+        else:
+            df.to_excel(path, index=False)
+        return path
+
+    def write_sheets(self, sheets, path):
+        """All sheets go into one freshly written workbook instead of reopening it per sheet."""
+        detach(path)
+        with pd.ExcelWriter(path, engine='openpyxl') as writer:
+            for sheet_name, df in sheets.items():
+                df.to_excel(writer, sheet_name=sheet_name, index=False)
+        return [path]
+
+
+ARTIFACT_STORES = {
+    "parquet": ParquetStore,
+    "feather": FeatherStore,
+    "xlsx": ExcelStore,
+}
+
+
+def detach(path, keep=False):
+    """Make `path` the run's own file before writing it when it links into a shared input tree.
+
+    The link is removed, or replaced by a copy of its target with `keep`
+    (a workbook that is updated sheet by sheet), so writes never reach the
+    shared file.
+    """
+    if not os.path.islink(path):
+        return
+    if keep:
+        shutil.copyfile(os.path.realpath(path), f"{path}.tmp")
+        os.replace(f"{path}.tmp", path)
+    else:
+        os.unlink(path)
+
+
+def read_original(path, sheet_name=None, **read_kwargs):
+    if path.endswith(".csv"):
+        return pd.read_csv(path, **read_kwargs)
+    if sheet_name is not None:
+        read_kwargs["sheet_name"] = sheet_name
+    return pd.read_excel(path, **read_kwargs)
+
+
+def get_artifact_store(artifact_format="parquet"):
+    if artifact_format not in ARTIFACT_STORES:
+        raise ValueError(f"Unknown artifact_format '{artifact_format}', expected one of {list(ARTIFACT_STORES)}")
+    if artifact_format in ("parquet", "feather") and not HAS_PYARROW:
+        logging.warning(f"pyarrow is not installed, falling back to xlsx artifacts instead of {artifact_format}")
+        artifact_format = "xlsx"
+    return ARTIFACT_STORES[artifact_format]()
+
+
+def save_deliverable(df, path):
+    """Client-facing outputs are always written as Excel, whatever the artifact format."""
+    df.to_excel(path, index=False)
+    logging.info(f"Saved deliverable {path}")
+    return path
+
+
+def get_excel_engine(config):
+    """Engine for reading raw Excel inputs: `excel_engine` in config, None for the pandas default."""
+    engine = config.get("excel_engine")
+    if engine == "calamine" and not HAS_CALAMINE:
+        logging.warning("python-calamine is not installed, reading Excel inputs with the default engine")
+        return None
+    return engine
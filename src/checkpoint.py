@@ -0,0 +1,100 @@
+import os
+import json
+import logging
+import threading
+from datetime import datetime
+
+import pandas as pd
+
+from stage_cache import stage_digest
+
+
+class Checkpoints:
+    """Manifest of the stages a run completed, with their artifacts, so a failed run can resume.
+
+    After every successful stage its artifacts are pickled to
+    `{checkpoint_dir}/{stage}/{fingerprint}.pkl`, the fingerprint covering
+    its config keys, the content of its raw input files and the fingerprints
+    of its upstream stages. Checkpoints are only looked up by fingerprint, so
+    a changed config value or input file invalidates the stage and everything
+    downstream of it, and runs of other brands or configs sharing the
+    directory never restore each other's artifacts. `manifest.json` lists the
+    checkpoints written, for inspection.
+    """
+
+    def __init__(self, checkpoint_dir="./output/checkpoints"):
+        self.checkpoint_dir = checkpoint_dir
+        self.manifest_path = os.path.join(checkpoint_dir, "manifest.json")
+        self.fingerprints = {}
+        self._lock = threading.Lock()
+
+    def fingerprint(self, stage, config, config_keys, input_files, upstream):
+        digest = stage_digest(stage, config, config_keys, input_files)
+        for up in upstream:
+            digest.update(self.fingerprints.get(up, "").encode())
+        self.fingerprints[stage] = digest.hexdigest()
+        return self.fingerprints[stage]
+
+    def path_for(self, stage):
+        """Checkpoint file of `stage` under its current fingerprint."""
+        return os.path.join(self.checkpoint_dir, stage, f"{self.fingerprints[stage]}.pkl")
+
+    def _update_manifest(self, stage, entry=None):
+        """Re-read the manifest and set (or with no `entry`, remove) this fingerprint of `stage`.
+
+        The file is shared with other runs, so it is merged rather than
+        overwritten with this run's view.
+        """
+        with self._lock:
+            manifest = {"stages": {}}
+            if os.path.exists(self.manifest_path):
+                try:
+                    with open(self.manifest_path) as f:
+                        manifest = json.load(f)
+                except ValueError as e:
+                    logging.warning(f"Rewriting unreadable checkpoint manifest {self.manifest_path}: {e}")
+            stages = manifest.setdefault("stages", {})
+            if entry is not None:
+                stages.setdefault(stage, {})[self.fingerprints[stage]] = entry
+            elif stages.get(stage, {}).pop(self.fingerprints[stage], None) is None:
+                return
+
+            os.makedirs(self.checkpoint_dir, exist_ok=True)
+            tmp_path = f"{self.manifest_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(manifest, f, indent=4)
+            os.replace(tmp_path, self.manifest_path)
+
+    def save(self, stage, artifacts):
+        """Checkpoint the artifacts `stage` produced, under its current fingerprint."""
+        path = self.path_for(stage)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        pd.to_pickle(artifacts, tmp_path)
+        os.replace(tmp_path, path)
+        self._update_manifest(stage, {
+            "artifacts": sorted(artifacts),
+            "saved_at": datetime.now().isoformat(timespec="seconds"),
+        })
+        logging.info(f"Checkpointed {stage} ({len(artifacts)} artifacts)")
+
+    def drop(self, stage):
+        """Forget the checkpoint of a stage that failed."""
+        path = self.path_for(stage)
+        if os.path.exists(path):
+            os.remove(path)
+        self._update_manifest(stage)
+
+    def is_valid(self, stage):
+        return stage in self.fingerprints and os.path.exists(self.path_for(stage))
+
+    def restore(self, stage, context):
+        """Put the checkpointed artifacts of `stage` back into the context; False when it has no valid checkpoint."""
+        if not self.is_valid(stage):
+            return False
+        artifacts = pd.read_pickle(self.path_for(stage))
+        with context.stage_scope(stage):
+            for name, df in artifacts.items():
+                context.put(name, df)
+        logging.info(f"Restored {stage} from checkpoint ({len(artifacts)} artifacts)")
+        return True
@@ -3,6 +3,8 @@ import json
 import logging
 import pandas as pd
 
+from run_context import save_artifact, workspace_path
+
 try:
     logging.basicConfig(
         filename='./output/logs/daily_ratio_sales.log',
@@ -18,11 +20,11 @@ for path in path_lst:
     os.makedirs(f"./output/{path}", exist_ok=True)
 
 
-def process_sales_data(config):
+def process_sales_data(config, context=None):
     if config['brand'] != "Kraken":
         print("Executing this ---- >")
         try:
-            monthly_df = pd.read_excel(config['input_files']["STROI"], sheet_name="Monthly Base Sales") ## This is the Standard Format
+            monthly_df = pd.read_excel(workspace_path(context, config['input_files']["STROI"]), sheet_name="Monthly Base Sales") ## This is the Standard Format
             # monthly_df = pd.read_excel("./input/Data/Vaseline_monthly_basesales.xlsx") 
             monthly_df.dropna(inplace=True)
 
@@ -31,7 +33,7 @@ def process_sales_data(config):
             logging.info(f"Loaded monthly_df with shape {monthly_df.shape}")
 
             # daily_df = pd.read_csv(config["Daily_Units_and_sales"])
-            daily_df = pd.read_csv(config['input_files']["Daily_Units_and_sales"])
+            daily_df = pd.read_csv(workspace_path(context, config['input_files']["Daily_Units_and_sales"]))
             # daily_df = pd.read_excel(config['input_files']["Daily_Units_and_sales"])
             logging.info(f"Loaded daily_df with shape {daily_df.shape}")
 
@@ -81,7 +83,7 @@ def process_sales_data(config):
                 if kpi_col in weekly_data.columns:
                     logging.info(f"kpi_col: {kpi_col}")
                     out_path = f"./input/Data/{config['brand']}_{suffix}.xlsx"
-                    weekly_data[["Date", kpi_col]].rename(columns={kpi_col: "kpi"}).to_excel(out_path, index=False)
+                    save_artifact(context, weekly_data[["Date", kpi_col]].rename(columns={kpi_col: "kpi"}), out_path)
                     logging.info(f"Exported {out_path}")
 
             
@@ -103,7 +105,7 @@ def process_sales_data(config):
             # ratio_df.drop(columns=[kpi_col], inplace=True, errors="ignore")
             logging.info("Final ratio_df created successfully.")
             out_file = f"./input/Data/{config['brand']}_daily_ratio_for_lt.xlsx"
-            ratio_df.to_excel(out_file, index=False)
+            save_artifact(context, ratio_df, out_file)
             logging.info(f"Saved final ratio_df to {out_file}")
             print(ratio_df.head())
             logging.info(f"-"*100)
@@ -116,7 +118,7 @@ def process_sales_data(config):
         print("Executing this")
         try:
             # daily_df = pd.read_csv("./LT/Model B/output/Daily raw abs - 05-06-2025.csv")
-            daily_df = pd.read_csv(config['Daily_Units_and_sales']) 
+            daily_df = pd.read_csv(workspace_path(context, config['Daily_Units_and_sales'])) 
             logging.info("daily data is loaded  successfully.",daily_df.head())
             daily_df['Date'] = pd.to_datetime(daily_df['Date'], format=config["date_format"])
             daily_df.drop(columns=["Others"], inplace=True)
@@ -126,7 +128,7 @@ def process_sales_data(config):
             weekly_data = weekly_data[weekly_data['Date'].dt.day_name() == 'Sunday'].reset_index(drop=True)
             logging.info("Converting to Weeekly Format.",weekly_data.head())
 
-            weekly_data[['Date','Baseline']].rename(columns={'Baseline':'kpi'}).to_excel(f"./input/Data/{config['brand']}_weekly NTUs.xlsx", index=False)
+            save_artifact(context, weekly_data[['Date','Baseline']].rename(columns={'Baseline':'kpi'}), f"./input/Data/{config['brand']}_weekly NTUs.xlsx")
             logging.info("Weekly NTUs saved sucessfully.",weekly_data.tail())
 
             weekly_data.set_index('Date', inplace=True)
@@ -140,7 +142,7 @@ def process_sales_data(config):
             logging.info("Creating Daily Ratio")
             ratio_df["Base NTUs Ratio"] = daily_df["Baseline"]/ratio_df["Baseline"]
             ratio_df.drop(columns=["Baseline"],inplace=True)
-            ratio_df.to_excel("./input/Data/"+config["brand"]+"_daily_ratio_for_lt.xlsx",index=False)
+            save_artifact(context, ratio_df, "./input/Data/"+config["brand"]+"_daily_ratio_for_lt.xlsx")
             logging.info("Daily Ratio for LT is sucessfully created",ratio_df.head())
             logging.info(f"-"*100)
             
@@ -3,6 +3,11 @@ import logging
 import os
 import json
 
+from artifact_store import get_excel_engine
+from metric_pool import run_tasks
+from input_catalog import get_input_cache, register_input
+from run_context import workspace_path
+
 path_lst = ['ensemble_results', 'Extrapolated Data', 'Weekly ROI Format', 'Weighted Cost', 'logs']
 for path in path_lst:
     os.makedirs(f"./output/{path}", exist_ok=True)
@@ -17,26 +22,81 @@ except Exception as e:
     print("Some Issue in creating log file", e)
 
 
-def data_ingestion(Weekly_Imp: str, Daily_cost: str, lagged_files: list,
-                   Daily_Impression: str, Model_A_Raw_Abs: str, config: dict):
-    try:
-        # ---------------- Unlagged Weekly Impressions ----------------
-        logging.info("Reading Weekly Impressions (Unlagged)")
-        unlagged = pd.read_excel(Weekly_Imp)
-        unlagged.fillna(0, inplace=True)
-        unlagged_path = f"./input/Data/{config['brand']}_Impressions_unlagged.xlsx"
-        unlagged.to_excel(unlagged_path, index=False)
-        logging.info(f"Saved Weekly Impressions to {unlagged_path}")
+def read_input(path, engine=None):
+    return pd.read_excel(path, engine=engine)
 
-        # ---------------- Daily Cost ----------------
-        logging.info("Reading Daily Cost")
-        cost = pd.read_excel(Daily_cost)
-        cost.fillna(0, inplace=True)
-        cost_path = f"./input/Data/{config['brand']}_Daily_Cost.xlsx"
-        cost.to_excel(cost_path, index=False)
-        logging.info(f"Saved Daily Cost to {cost_path}")
 
-        # ---------------- Lagged Impressions ----------------
+def read_model_a(Model_A_Raw_Abs, metrics=None, engine=None):
+    """Open the Model A workbook once and parse every metric sheet in one pass."""
+    with pd.ExcelFile(Model_A_Raw_Abs, engine=engine) as excel_obj:
+        all_sheets = excel_obj.sheet_names
+        metrics = metrics or all_sheets
+        logging.info(f"Processing metrics/sheets: {metrics}")
+
+        metric_sheets = {}
+        for metric in metrics:
+            possible_names = [metric, f"{metric} Final"]
+            # possible_names = [metric, f"{metric} FINAL"]
+            sheet = next((s for s in all_sheets if s in possible_names), None)
+
+            if sheet is None:
+                logging.warning(f"Skipping {metric}, no matching sheet found in Excel")
+                continue
+            metric_sheets[metric] = sheet
+
+        parsed_sheets = excel_obj.parse(sheet_name=list(dict.fromkeys(metric_sheets.values()))) if metric_sheets else {}
+
+    return {metric: parsed_sheets[sheet].copy() for metric, sheet in metric_sheets.items()}
+
+
+def take_parsed(parsed, name, path, context=None):
+    """Result of one ingestion task; re-raises its error and logs its parse time."""
+    df, seconds, error = parsed[name]
+    if error is not None:
+        raise error
+    logging.info(f"Parsed {name} ({path}) in {seconds:.2f}s")
+    print(f"Parsed {name} in {seconds:.2f}s")
+    if context is not None:
+        context.record("input", path, df, os.path.getsize(path), seconds=round(seconds, 4))
+    return df
+
+
+def normalize_model_a(df_metric):
+    df_metric.fillna(0,inplace=True)
+    if "Date" in df_metric.columns:
+        df_metric["Date"] = pd.to_datetime(df_metric["Date"], errors="coerce")
+    return df_metric
+
+
+def ingest_table(parsed, cached, cache, context, brand, role, path):
+    """Normalized table for `role`, from the input cache or freshly parsed (then cached)."""
+    if role in cached:
+        logging.info(f"Using cached {role} for {brand} ({path})")
+        return cached[role]
+
+    df = take_parsed(parsed, role, path, context)
+    df.fillna(0, inplace=True)
+    if cache is not None:
+        cache.put(brand, role, path, {"table": df})
+    return df
+
+
+def data_ingestion(Weekly_Imp: str, Daily_cost: str, lagged_files: list,
+                   Daily_Impression: str, Model_A_Raw_Abs: str, config: dict, context=None):
+    """Parse and normalize the raw inputs and register them in the input catalog.
+
+    Tables are registered under (brand, role) instead of being re-saved as
+    xlsx; with `input_cache_dir` set, normalized tables are also kept as
+    Parquet keyed by the source file hash and reused while the source is unchanged.
+    """
+    engine = get_excel_engine(config)
+    cache = get_input_cache(config, engine)
+    brand = config['brand']
+    Weekly_Imp, Daily_cost, Daily_Impression, Model_A_Raw_Abs = (
+        workspace_path(context, path) for path in (Weekly_Imp, Daily_cost, Daily_Impression, Model_A_Raw_Abs)
+    )
+    try:
+        lagged_paths = {}
         for metric in config["metrics"]:
             matched_files = [f for f in lagged_files if metric in f]
 
@@ -46,18 +106,59 @@ def data_ingestion(Weekly_Imp: str, Daily_cost: str, lagged_files: list,
             if len(matched_files) > 1:
                 logging.warning(f"Multiple files found for metric: {metric}, using first one")
 
-            file_path = matched_files[0]
-            print("Metric:", metric, "| File Path:", file_path)
+            lagged_paths[metric] = workspace_path(context, matched_files[0])
+            print("Metric:", metric, "| File Path:", matched_files[0])
+
+        # catalog role -> raw source file
+        sources = {
+            "Impressions_unlagged": Weekly_Imp,
+            "Daily_Cost": Daily_cost,
+            **{f"Impressions_lagged_{metric}": file_path for metric, file_path in lagged_paths.items()},
+            "Daily_Impressions": Daily_Impression,
+        }
+        model_a_key = "|".join(config.get("metrics") or [])
+
+        # ---------------- Input cache ----------------
+        cached = {}
+        if cache is not None:
+            for role, file_path in sources.items():
+                tables = cache.get(brand, role, file_path)
+                if tables is not None:
+                    cached[role] = tables["table"]
+            tables = cache.get(brand, "Model_A_Raw_Abs", Model_A_Raw_Abs, model_a_key)
+            if tables is not None:
+                cached["Model_A_Raw_Abs"] = tables
+            logging.info(f"Input cache hits for {brand}: {list(cached)}")
+
+        # ---------------- Parse all remaining inputs ----------------
+        # Every input is an independent Excel parse; with max_workers > 1 they run
+        # in a process pool, so ingestion is bounded by the largest file.
+        tasks = {role: (read_input, (file_path, engine)) for role, file_path in sources.items() if role not in cached}
+        if "Model_A_Raw_Abs" not in cached:
+            tasks["Model_A_Raw_Abs"] = (read_model_a, (Model_A_Raw_Abs, config.get("metrics"), engine))
+        parsed = run_tasks(tasks, config.get("max_workers", 1))
+
+        # ---------------- Unlagged Weekly Impressions ----------------
+        logging.info("Reading Weekly Impressions (Unlagged)")
+        unlagged = ingest_table(parsed, cached, cache, context, brand, "Impressions_unlagged", Weekly_Imp)
+        register_input(context, brand, "Impressions_unlagged", unlagged)
+        logging.info(f"Registered Weekly Impressions as {brand}/Impressions_unlagged")
+
+        # ---------------- Daily Cost ----------------
+        logging.info("Reading Daily Cost")
+        cost = ingest_table(parsed, cached, cache, context, brand, "Daily_Cost", Daily_cost)
+        register_input(context, brand, "Daily_Cost", cost)
+        logging.info(f"Registered Daily Cost as {brand}/Daily_Cost")
 
+        # ---------------- Lagged Impressions ----------------
+        for metric, file_path in lagged_paths.items():
             try:
                 logging.info(f"Processing Lagged Impressions for metric: {metric}")
-                df_lagged = pd.read_excel(file_path)
-                df_lagged.fillna(0, inplace=True)
+                role = f"Impressions_lagged_{metric}"
+                df_lagged = ingest_table(parsed, cached, cache, context, brand, role, file_path)
+                register_input(context, brand, role, df_lagged)
 
-                out_path = f"./input/Data/{config['brand']}_Impressions_lagged_{metric}.xlsx"
-                df_lagged.to_excel(out_path, index=False)
-
-                logging.info(f"Saved Lagged Impressions {metric} to {out_path}")
+                logging.info(f"Registered Lagged Impressions {metric} as {brand}/{role}")
                 print(f"Success for {metric}")
 
             except Exception as e:
@@ -67,45 +168,27 @@ def data_ingestion(Weekly_Imp: str, Daily_cost: str, lagged_files: list,
 
         # ---------------- Daily Impressions ----------------
         logging.info("Reading Daily Impressions")
-        daily_imp = pd.read_excel(Daily_Impression)
-        daily_imp.fillna(0, inplace=True)
-        daily_imp_path = f"./input/Data/{config['brand']}_Daily_Impressions.xlsx"
-        daily_imp.to_excel(daily_imp_path, index=False)
-        logging.info(f"Saved Daily Impressions to {daily_imp_path}")
+        daily_imp = ingest_table(parsed, cached, cache, context, brand, "Daily_Impressions", Daily_Impression)
+        register_input(context, brand, "Daily_Impressions", daily_imp)
+        logging.info(f"Registered Daily Impressions as {brand}/Daily_Impressions")
 
         # ---------------- Model A Raw Abs ----------------
         logging.info("Processing Model A Raw Abs file")
-        metrics = config.get("metrics")
-        if not metrics:
-            excel_obj = pd.ExcelFile(Model_A_Raw_Abs)
-            metrics = excel_obj.sheet_names
-
-        logging.info(f"Processing metrics/sheets: {metrics}")
-        model_data = {}
-
-        for metric in metrics:
-            excel_obj = pd.ExcelFile(Model_A_Raw_Abs)
-            all_sheets = excel_obj.sheet_names
-
-            possible_names = [metric, f"{metric} Final"]
-            # possible_names = [metric, f"{metric} FINAL"]
-            sheet = next((s for s in all_sheets if s in possible_names), None)
-
-            if sheet is None:
-                logging.warning(f"Skipping {metric}, no matching sheet found in Excel")
-                continue
-
-            df_metric = pd.read_excel(Model_A_Raw_Abs, sheet_name=sheet)
-            df_metric.fillna(0,inplace=True)
-            if "Date" in df_metric.columns:
-                df_metric["Date"] = pd.to_datetime(df_metric["Date"], errors="coerce")
-
-            output_path = f"./input/raw attribution/raw_abs_{config['brand']}_{metric}_ensemble.csv"
-            df_metric.to_csv(output_path, index=False)
-
-            model_data[metric] = df_metric
-            print(f"Saved {metric} data to {output_path}")
-            logging.info(f"Saved {metric} data to {output_path}")
+        if "Model_A_Raw_Abs" in cached:
+            logging.info(f"Using cached Model A Raw Abs for {brand} ({Model_A_Raw_Abs})")
+            model_data = cached["Model_A_Raw_Abs"]
+        else:
+            model_data = {
+                metric: normalize_model_a(df_metric)
+                for metric, df_metric in take_parsed(parsed, "Model_A_Raw_Abs", Model_A_Raw_Abs, context).items()
+            }
+            if cache is not None:
+                cache.put(brand, "Model_A_Raw_Abs", Model_A_Raw_Abs, model_data, model_a_key)
+
+        for metric, df_metric in model_data.items():
+            register_input(context, brand, f"raw_abs_{metric}_ensemble", df_metric)
+            print(f"Registered {metric} data as {brand}/raw_abs_{metric}_ensemble")
+            logging.info(f"Registered {metric} data as {brand}/raw_abs_{metric}_ensemble")
             
         logging.info(f"-" * 100)
         return unlagged, cost, daily_imp, model_data
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+
+from granularity import GRANULARITY_COLS
+
+# Repeated string dimensions of the long-format tables
+DIMENSION_COLS = GRANULARITY_COLS + ["Channel/Daypart", "Merged Granularity", "Metrics", "Feature"]
+# Integer-like keys that stay as they are even when stored as floats
+KEY_COLS = ["Year", "Month", "Week"]
+
+
+def get_dtype_policy(config):
+    """`categorical_dimensions` (default on) and `float32_measures` (default off) from the config."""
+    return {
+        "categorical": config.get("categorical_dimensions", True),
+        "float32": config.get("float32_measures", False),
+    }
+
+
+def is_dimension(series):
+    """True for string dimensions, whether still `object` or already categorical."""
+    return series.dtype == 'object' or isinstance(series.dtype, pd.CategoricalDtype)
+
+
+def fill_dimension(series, value):
+    """`series.fillna(value)` that also works on categoricals, keeping the categories sorted."""
+    if isinstance(series.dtype, pd.CategoricalDtype) and value not in series.cat.categories:
+        series = series.cat.set_categories(series.cat.categories.union([value]))
+    return series.fillna(value)
+
+
+def apply_dtype_policy(df, policy):
+    """Compact `df` under the policy; returns the new frame and the bytes saved."""
+    if not policy or not (policy.get("categorical") or policy.get("float32")):
+        return df, 0
+
+    converted = {}
+    for col in df.columns:
+        series = df[col]
+        if policy.get("categorical") and col in DIMENSION_COLS and series.dtype == 'object':
+            converted[col] = series.astype("category")
+        elif policy.get("float32") and col not in KEY_COLS and series.dtype == np.float64:
+            converted[col] = series.astype(np.float32)
+    if not converted:
+        return df, 0
+
+    before = df[list(converted)].memory_usage(index=False, deep=True).sum()
+    after = sum(s.memory_usage(index=False, deep=True) for s in converted.values())
+    df = df.assign(**converted)
+    return df, int(before - after)
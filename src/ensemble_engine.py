@@ -0,0 +1,90 @@
+import logging
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from metric_pool import measured, measured_result, process_pool
+
+
+def read_member(path):
+    """Parse one raw ensemble member CSV."""
+    return pd.read_csv(path)
+
+
+def _load(source):
+    return source() if callable(source) else read_member(source)
+
+
+def iter_members(sources, max_workers=1):
+    """Yield member frames in order.
+
+    A source is either a CSV path or a zero-argument callable returning the
+    frame (a member the run already holds in memory or in the artifact store).
+    With `max_workers` > 1 the CSV paths are parsed in a process pool with at
+    most `max_workers` parses in flight, so memory stays bounded by that
+    window rather than by the member count.
+    """
+    if max_workers <= 1:
+        for source in sources:
+            yield _load(source)
+        return
+
+    with process_pool(max_workers) as pool:
+        pending = deque()
+        remaining = iter(sources)
+
+        def submit_next():
+            source = next(remaining, None)
+            if source is None:
+                return
+            pending.append(source if callable(source) else pool.submit(measured, read_member, source))
+
+        for _ in range(max_workers):
+            submit_next()
+        while pending:
+            item = pending.popleft()
+            member = item() if callable(item) else measured_result(item)
+            submit_next()
+            yield member
+
+
+def ensemble_average(sources, date_format, weights=None, names=None, max_workers=1, on_member=None):
+    """Weighted mean of ensemble members streamed into one preallocated accumulator.
+
+    The first member fixes the value columns and the row count. Every member is
+    aligned to those columns through an indexer computed once per distinct
+    column layout and added in place, so only one member is held at a time.
+    Rows are aligned by position, as the `DataFrame.add` loop this replaces did.
+    Returns the averaged values and the Date column of the last member.
+    """
+    names = names or [str(source) for source in sources]
+    weights = np.ones(len(sources)) if weights is None else np.asarray(weights, dtype=float)
+    if len(weights) != len(sources):
+        raise ValueError(f"Got {len(weights)} ensemble weights for {len(sources)} members")
+    if weights.sum() == 0:
+        raise ValueError("Ensemble weights sum to zero")
+
+    columns, accumulator, dates = None, None, None
+    indexers = {}
+    for name, weight, member in zip(names, weights, iter_members(sources, max_workers)):
+        if on_member is not None:
+            on_member(name, member)
+        if columns is None:
+            columns = member.columns.drop("Date")
+            accumulator = np.zeros((len(member), len(columns)))
+
+        layout = tuple(member.columns)
+        if layout not in indexers:
+            indexer = member.columns.get_indexer(columns)
+            if (indexer < 0).any():
+                raise KeyError(f"{name} is missing columns {list(columns[indexer < 0])}")
+            indexers[layout] = indexer
+        if len(member) != len(accumulator):
+            raise ValueError(f"{name} has {len(member)} rows, expected {len(accumulator)}")
+
+        dates = pd.to_datetime(member["Date"], format=date_format)
+        accumulator += weight * member.iloc[:, indexers[layout]].to_numpy(dtype=float)
+        logging.info(f"Added ensemble member {name} (weight {weight})")
+
+    return pd.DataFrame(accumulator, columns=columns) / weights.sum(), dates.reset_index(drop=True)
@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+
+GRANULARITY_ID = "Granularity ID"
+GRANULARITY_COLS = ["Media Type", "Product Line", "Master Channel", "Channel", "Platform"]
+
+
+def granularity_columns(flag):
+    """Columns a `Merged Granularity` string ("Media Type|Product Line|...") splits into for a ProductLine_Flag."""
+    if flag == 1:
+        return GRANULARITY_COLS
+    if flag == 2:
+        return GRANULARITY_COLS[:4]
+    return ["Media Type", "Master Channel", "Channel", "Platform"]
+
+
+def split_granularity(merged, columns):
+    """Split `Merged Granularity` strings into `columns`, parsing each distinct string once.
+
+    Same result as `merged.str.split("|", expand=True)` assigned to `columns`,
+    returned as a DataFrame aligned with `merged`.
+    """
+    codes, uniques = pd.factorize(merged, use_na_sentinel=False)
+    parts = pd.Series(uniques, dtype=object).str.split("|", expand=True)
+    if parts.shape[1] != len(columns):
+        raise ValueError("Columns must be same length as key")
+    parts = parts.take(codes)
+    parts.columns = columns
+    parts.index = merged.index
+    return parts
+
+
+def encode_granularity(frames, columns):
+    """Replace `columns` of every frame by one shared integer granularity ID.
+
+    IDs follow the lexicographic order of the column values with missing values
+    last, the order pandas sorts merge keys in, so sorting or an outer merge on
+    the ID orders rows as it would on the columns. Returns the encoded frames
+    and the dimension table (row `i` holds the columns of ID `i`).
+    """
+    sizes = np.cumsum([len(df) for df in frames])[:-1]
+    codes, levels = [], []
+    for col in columns:
+        col_codes, uniques = pd.factorize(pd.concat([df[col] for df in frames], ignore_index=True), sort=True)
+        codes.append(np.where(col_codes < 0, len(uniques), col_codes))
+        levels.append(pd.Index(uniques).insert(len(uniques), np.nan))
+
+    keys, ids = np.unique(np.column_stack(codes), axis=0, return_inverse=True)
+    dim = pd.DataFrame({col: level.take(keys[:, i]) for i, (col, level) in enumerate(zip(columns, levels))})
+
+    encoded = []
+    for df, df_ids in zip(frames, np.split(ids.ravel(), sizes)):
+        df = df.drop(columns=columns)
+        df.insert(0, GRANULARITY_ID, df_ids)
+        encoded.append(df)
+    return encoded, dim
+
+
+def decode_granularity(df, dim, order):
+    """Put the granularity columns of `dim` back in place of the ID and reorder to `order`."""
+    ids = df[GRANULARITY_ID].to_numpy()
+    decoded = df.drop(columns=[GRANULARITY_ID])
+    for col in dim.columns:
+        decoded[col] = dim[col].to_numpy()[ids]
+    return decoded[list(order)]
+
+
+def merge_on_granularity(left, right, on, columns, how="left"):
+    """`pd.merge(left, right, on=on, how=how)` as an integer join on the granularity ID.
+
+    `columns` are the granularity keys within `on`; they must lead `on`, e.g.
+    the granularity columns followed by Year and Month.
+    """
+    order = pd.merge(left.iloc[:0], right.iloc[:0], on=on, how=how).columns
+    (left, right), dim = encode_granularity([left, right], columns)
+    merged = pd.merge(left, right, on=[GRANULARITY_ID] + [k for k in on if k not in columns], how=how)
+    return decode_granularity(merged, dim, order)
+
+
+def name_granularities(df, columns, name_row):
+    """`df[columns].apply(name_row, axis=1)`, evaluated once per distinct granularity."""
+    (encoded,), dim = encode_granularity([df[columns]], columns)
+    names = dim.apply(name_row, axis=1).to_numpy(dtype=object) if len(dim) else np.array([], dtype=object)
+    return pd.Series(names[encoded[GRANULARITY_ID].to_numpy()], index=df.index)
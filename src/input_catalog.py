@@ -0,0 +1,86 @@
+import os
+import json
+import shutil
+import hashlib
+import logging
+import pandas as pd
+
+from artifact_store import HAS_PYARROW
+from run_context import has_artifact, load_artifact, save_artifact
+from stage_cache import hash_file
+
+
+def catalog_path(brand, role):
+    """Legacy file a catalog entry stands for, e.g. ("Vaseline", "Daily_Cost") -> ./input/Data/Vaseline_Daily_Cost.xlsx.
+
+    Model A ensembles use the role `raw_abs_{metric}_ensemble`. Entries keep
+    their historical paths so `export_intermediates` and standalone stage runs
+    still find the same files.
+    """
+    if role.startswith("raw_abs_"):
+        return f"./input/raw attribution/raw_abs_{brand}_{role[len('raw_abs_'):]}.csv"
+    return f"./input/Data/{brand}_{role}.xlsx"
+
+
+def register_input(context, brand, role, df):
+    """Register a parsed, normalized input table under (brand, role)."""
+    save_artifact(context, df, catalog_path(brand, role))
+
+
+def has_input(context, brand, role):
+    return has_artifact(context, catalog_path(brand, role))
+
+
+def load_input(context, brand, role):
+    return load_artifact(context, catalog_path(brand, role))
+
+
+class InputCache:
+    """Columnar cache of normalized ingestion tables keyed by the content hash of their source file.
+
+    An entry lives in `{cache_dir}/{brand}/{role}/{digest}/` as one Parquet
+    file per table plus a manifest written last, so a half-written entry is
+    never read. A changed source file (or reader engine) gets a new digest.
+    """
+
+    def __init__(self, cache_dir, engine=None):
+        self.cache_dir = cache_dir
+        self.engine = engine
+
+    def entry_dir(self, brand, role, source_path, key_extra=""):
+        digest = hashlib.sha256(f"{hash_file(source_path)}|{self.engine}|{key_extra}".encode()).hexdigest()[:24]
+        return os.path.join(self.cache_dir, brand, role, digest)
+
+    def get(self, brand, role, source_path, key_extra=""):
+        """Cached tables for this source as `name: DataFrame`, or None."""
+        entry_dir = self.entry_dir(brand, role, source_path, key_extra)
+        manifest_path = os.path.join(entry_dir, "manifest.json")
+        if not os.path.exists(manifest_path):
+            return None
+        try:
+            with open(manifest_path) as f:
+                names = json.load(f)["tables"]
+            return {name: pd.read_parquet(os.path.join(entry_dir, f"{name}.parquet")) for name in names}
+        except Exception as e:
+            logging.warning(f"Ignoring unreadable input cache entry {entry_dir}: {e}")
+            return None
+
+    def put(self, brand, role, source_path, tables, key_extra=""):
+        entry_dir = self.entry_dir(brand, role, source_path, key_extra)
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        os.makedirs(entry_dir, exist_ok=True)
+        for name, df in tables.items():
+            df.to_parquet(os.path.join(entry_dir, f"{name}.parquet"), index=False)
+        with open(os.path.join(entry_dir, "manifest.json"), "w") as f:
+            json.dump({"source": source_path, "tables": list(tables)}, f)
+        logging.info(f"Cached {role} for {brand} in {entry_dir}")
+
+
+def get_input_cache(config, engine=None):
+    cache_dir = config.get("input_cache_dir")
+    if not cache_dir:
+        return None
+    if not HAS_PYARROW:
+        logging.warning("pyarrow is not installed, the input cache is disabled")
+        return None
+    return InputCache(cache_dir, engine)
@@ -0,0 +1,125 @@
+import os
+import time
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# CPU time and peak RSS of the pool workers that ran tasks for each stage thread
+_worker_usage = threading.local()
+
+
+def peak_rss():
+    """Peak resident set size of this process in bytes (None where unsupported)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+
+def measured(func, *args):
+    """Call `func(*args)` in a pool worker; returns the result with the worker's CPU seconds and peak RSS."""
+    cpu = time.process_time()
+    result = func(*args)
+    return result, time.process_time() - cpu, peak_rss()
+
+
+def measured_result(future):
+    """Result of a `measured` task, adding its worker CPU time and RSS to the calling thread's usage."""
+    result, cpu_s, rss = future.result()
+    _worker_usage.cpu_s = getattr(_worker_usage, "cpu_s", 0.0) + cpu_s
+    if rss is not None:
+        _worker_usage.peak_rss = max(getattr(_worker_usage, "peak_rss", None) or 0, rss)
+    return result
+
+
+def reset_worker_usage():
+    _worker_usage.cpu_s, _worker_usage.peak_rss = 0.0, None
+
+
+def worker_usage():
+    """`{"cpu_s", "peak_rss"}` of the pool workers used by the calling thread since `reset_worker_usage()`."""
+    return {"cpu_s": getattr(_worker_usage, "cpu_s", 0.0), "peak_rss": getattr(_worker_usage, "peak_rss", None)}
+
+
+def process_pool(max_workers):
+    """ProcessPoolExecutor for work inside a stage.
+
+    Stages running side by side live on threads, and forking while another
+    thread holds a lock (logging, pandas) can deadlock the workers, so pools
+    started off the main thread use a forkserver instead.
+    """
+    if threading.current_thread() is threading.main_thread():
+        return ProcessPoolExecutor(max_workers=max_workers)
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("forkserver"))
+
+
+def _run_metric(func, config, metric, context, args):
+    before = {} if context is None else context.snapshot()
+    result = func(config, metric, context, *args)
+    if context is None:
+        return result, {}, []
+    return result, context.produced(before), context.io_log
+
+
+def map_metrics(func, metrics, config, context=None, inputs=None, args=()):
+    """Run `func(config, metric, context, *args)` for every metric, results in metric order.
+
+    With `max_workers` > 1 in the config the metrics run in a process pool.
+    Each worker gets a context holding only the artifacts named by
+    `inputs(metric)` (all of them when `inputs` is None); the artifacts it
+    saves are merged back into `context` in metric order, so later stages see
+    the same state as a sequential run.
+    """
+    metrics = list(metrics)
+    max_workers = min(config.get("max_workers", 1) or 1, len(metrics))
+    if max_workers <= 1:
+        return [func(config, metric, context, *args) for metric in metrics]
+
+    logging.info(f"Running {func.__name__} for {metrics} on {max_workers} workers")
+    with process_pool(max_workers) as pool:
+        futures = [
+            pool.submit(measured, _run_metric, func, config, metric,
+                        None if context is None else context.subset(None if inputs is None else inputs(metric)),
+                        args)
+            for metric in metrics
+        ]
+        results = []
+        for future in futures:
+            result, outputs, io_log = measured_result(future)
+            if context is not None:
+                for name, df in outputs.items():
+                    context.put(name, df)
+                context.merge_log(io_log)
+            results.append(result)
+    return results
+
+
+def _run_task(func, args):
+    started = time.perf_counter()
+    try:
+        return func(*args), time.perf_counter() - started, None
+    except Exception as e:
+        return None, time.perf_counter() - started, e
+
+
+def run_tasks(tasks, max_workers=1):
+    """Run independent `name: (func, args)` tasks, in a process pool when `max_workers` > 1.
+
+    Returns `name: (result, seconds, error)` in task order. Exceptions are
+    returned rather than raised so callers keep their own error handling.
+    """
+    max_workers = min(max_workers or 1, len(tasks))
+    if max_workers <= 1:
+        return {name: _run_task(func, args) for name, (func, args) in tasks.items()}
+
+    logging.info(f"Running {len(tasks)} tasks on {max_workers} workers")
+    with process_pool(max_workers) as pool:
+        futures = {name: pool.submit(measured, _run_task, func, args) for name, (func, args) in tasks.items()}
+        return {name: measured_result(future) for name, future in futures.items()}
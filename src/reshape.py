@@ -0,0 +1,43 @@
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+
+@lru_cache(maxsize=None)
+def normalize_column(col):
+    """Granularity part of a wide column name.
+
+    "TV|Linear TV|x|effect_essence" -> "TV|Linear TV" (Model A suffix dropped),
+    "TV|Linear TV|Impressions" -> "TV|Linear TV" ("Impressions"/"Cost" parts dropped).
+    """
+    parts = col.split("|")
+    if "effect_essence" in col:
+        parts = parts[:-2]
+    return "|".join(part for part in parts if part not in ("Impressions", "Cost"))
+
+
+@lru_cache(maxsize=256)
+def normalize_columns(columns):
+    """`normalize_column` over a whole header (a tuple), memoized per header."""
+    return tuple(normalize_column(col) for col in columns)
+
+
+def wide_to_long(df, value_name, id_col="Date", var_name="Merged Granularity", normalize=True):
+    """Melt a wide table into (`id_col`, `var_name`, `value_name`) rows; `id_col` may be a list.
+
+    Same rows, order and value dtype as
+    `pd.DataFrame(df.set_index(id_col).T.unstack()).reset_index()` renamed:
+    one row per (id, column) pair, ids in row order and columns in header
+    order. The values are flattened straight from the frame's 2-D block, so
+    the wide table is never transposed. With `normalize` the column names go
+    through `normalize_columns` first.
+    """
+    id_cols = [id_col] if isinstance(id_col, str) else list(id_col)
+    values = df.drop(columns=id_cols)
+    names = normalize_columns(tuple(values.columns)) if normalize else tuple(values.columns)
+    values = values.to_numpy()
+    long = {col: np.repeat(df[col].to_numpy(), len(names)) for col in id_cols}
+    long[var_name] = np.tile(np.array(names, dtype=object), len(df))
+    long[value_name] = values.ravel()
+    return pd.DataFrame(long)
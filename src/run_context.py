@@ -0,0 +1,186 @@
+import os
+import logging
+import threading
+from contextlib import contextmanager
+
+from artifact_store import get_artifact_store
+from dtype_policy import apply_dtype_policy
+from workspace import DEFAULT_WORKSPACE
+
+DEFAULT_STORE = get_artifact_store("parquet")
+# Stages called on their own (context=None) keep the legacy .xlsx/.csv files
+# that standalone callers read back with pd.read_excel/read_csv.
+STANDALONE_STORE = get_artifact_store("xlsx")
+
+
+class RunContext:
+    """In-memory store for the DataFrames handed from one pipeline stage to the next."""
+
+    def __init__(self, export_intermediates=False, store=None, dtype_policy=None, workspace=None):
+        self.export_intermediates = export_intermediates
+        self.store = store or DEFAULT_STORE
+        self.dtype_policy = dtype_policy
+        self.workspace = workspace or DEFAULT_WORKSPACE
+        self.artifacts = {}
+        self.producers = {}
+        self.io_log = []
+        self._local = threading.local()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_local"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = threading.local()
+
+    @property
+    def current_stage(self):
+        """Pipeline stage running in the calling thread (stages may run side by side)."""
+        return getattr(self._local, "stage", None)
+
+    @contextmanager
+    def stage_scope(self, stage):
+        """Attribute the artifacts and io events of the calling thread to `stage`."""
+        previous, self._local.stage = self.current_stage, stage
+        try:
+            yield
+        finally:
+            self._local.stage = previous
+
+    def __contains__(self, name):
+        return name in self.artifacts
+
+    def put(self, name, df):
+        self.artifacts[name] = df
+        self.producers[name] = self.current_stage
+
+    def get(self, name):
+        return self.artifacts[name].copy()
+
+    def record(self, event, name, df, nbytes=0, **extra):
+        """Log an artifact read or write (or a raw input parse) for the run report.
+
+        `df` may be a dict of frames parsed from one file, e.g. workbook sheets,
+        or None for an event that only carries `extra` fields.
+        """
+        frames = [] if df is None else list(df.values()) if isinstance(df, dict) else [df]
+        self.io_log.append({
+            "event": event, "name": name, "rows": sum(len(f) for f in frames),
+            "cols": sum(f.shape[1] for f in frames), "bytes": nbytes, "stage": self.current_stage, **extra,
+        })
+
+    def merge_log(self, io_log):
+        """Add events logged in a worker process to the log, under the current stage."""
+        self.io_log.extend(dict(e, stage=e.get("stage") or self.current_stage) for e in io_log)
+
+    def snapshot(self):
+        """`name: id(df)` of the artifacts held now, to tell later which ones a stage produced."""
+        return {name: id(df) for name, df in list(self.artifacts.items())}
+
+    def produced(self, before, stage=None):
+        """Artifacts put since `snapshot()` returned `before`, only those of `stage` when given."""
+        return {
+            name: df for name, df in list(self.artifacts.items())
+            if before.get(name) != id(df) and (stage is None or self.producers.get(name) == stage)
+        }
+
+    def compact(self, name, df):
+        """Apply the run's dtype policy to an artifact it is about to hold and log the memory saved."""
+        df, saved = apply_dtype_policy(df, self.dtype_policy)
+        if saved:
+            self.record("compact", name, df, saved)
+        return df
+
+    def subset(self, names=None):
+        """Context with the same settings holding only `names`, to hand to a worker process."""
+        child = RunContext(self.export_intermediates, self.store, self.dtype_policy, self.workspace)
+        for name in (self.artifacts if names is None else names):
+            if name in self.artifacts:
+                child.artifacts[name] = self.artifacts[name]
+        return child
+
+
+def artifact_name(path, sheet_name=None):
+    name = os.path.normpath(os.path.splitext(path)[0])
+    return f"{name}::{sheet_name}" if sheet_name else name
+
+
+def get_store(context):
+    return STANDALONE_STORE if context is None else context.store
+
+
+def workspace_path(context, path):
+    """Where the run's relative `path` lives on disk (under its workspace root)."""
+    return (DEFAULT_WORKSPACE if context is None else context.workspace).path(path)
+
+
+def should_export(context):
+    return context is None or context.export_intermediates
+
+
+def has_artifact(context, path, sheet_name=None):
+    if context is not None and artifact_name(path, sheet_name) in context:
+        return True
+    return get_store(context).exists(workspace_path(context, path), sheet_name)
+
+
+def is_stored(context, path, sheet_name=None):
+    """True when `path` is held by the run or was written by the artifact store, so loading it skips the original file."""
+    if context is not None and artifact_name(path, sheet_name) in context:
+        return True
+    return os.path.exists(get_store(context).path_for(workspace_path(context, path), sheet_name))
+
+
+def load_artifact(context, path, sheet_name=None, **read_kwargs):
+    """Return the artifact for `path` from the run context, falling back to the artifact store."""
+    name = artifact_name(path, sheet_name)
+    if context is not None and name in context:
+        logging.info(f"Using in-memory artifact {name}")
+        df = context.get(name)
+        context.record("read", name, df)
+        return df
+
+    store = get_store(context)
+    path = workspace_path(context, path)
+    df = store.read(path, sheet_name, **read_kwargs)
+    if context is not None:
+        store_path = store.path_for(path, sheet_name)
+        source = store_path if os.path.exists(store_path) else path
+        context.record("read", name, df, os.path.getsize(source))
+    return df
+
+
+def save_artifact(context, df, path, sheet_name=None):
+    """Hand `df` to the next stage and write it through the artifact store when exports are enabled."""
+    df = df.infer_objects()
+    if context is not None:
+        df = context.compact(artifact_name(path, sheet_name), df)
+        context.put(artifact_name(path, sheet_name), df)
+
+    if not should_export(context):
+        return
+
+    store_path = get_store(context).write(df, workspace_path(context, path), sheet_name)
+    logging.info(f"Exported {store_path}")
+    if context is not None:
+        context.record("write", artifact_name(path, sheet_name), df, os.path.getsize(store_path))
+
+
+def save_sheets(context, sheets, path):
+    """`save_artifact` for every `sheet_name: df` of one workbook; an exported workbook is written once."""
+    sheets = {sheet_name: df.infer_objects() for sheet_name, df in sheets.items()}
+    if context is not None:
+        sheets = {sheet_name: context.compact(artifact_name(path, sheet_name), df) for sheet_name, df in sheets.items()}
+        for sheet_name, df in sheets.items():
+            context.put(artifact_name(path, sheet_name), df)
+
+    if not should_export(context):
+        return
+
+    store_paths = get_store(context).write_sheets(sheets, workspace_path(context, path))
+    logging.info(f"Exported {len(sheets)} sheets to {', '.join(dict.fromkeys(store_paths))}")
+    if context is not None:
+        nbytes = sum(os.path.getsize(p) for p in set(store_paths))
+        context.record("write", artifact_name(path), sheets, nbytes)
@@ -0,0 +1,186 @@
+import os
+import json
+import time
+import cProfile
+import logging
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+from metric_pool import peak_rss, reset_worker_usage, worker_usage
+
+MB = 1024 * 1024
+
+
+def _mb(nbytes):
+    return None if nbytes is None else round(nbytes / MB, 2)
+
+
+def _file_size(path):
+    return os.path.getsize(path) if path and os.path.exists(path) else 0
+
+
+class RunReport:
+    """Per-stage wall/CPU time, memory, row/column and I/O statistics for one run.
+
+    Rows and columns in are those of the artifacts a stage loaded; rows and
+    columns out those of the artifacts it left in the run context. Bytes read
+    cover the stage's raw input files plus artifacts loaded from disk, bytes
+    written the artifacts it exported, memory saved what the dtype policy
+    trimmed off the artifacts it produced. Peak RSS is always recorded;
+    tracemalloc deltas only with `trace_memory`, since tracing slows the
+    pandas-heavy stages several times over.
+    """
+
+    def __init__(self, context, config, planned=()):
+        self.context = context
+        self.planned = list(planned)
+        self.progress_path = context.workspace.path(config.get("progress_path"))
+        self.brand = config.get("brand")
+        self.trace_memory = config.get("trace_memory", False)
+        profile_stages = config.get("profile_stages", False)
+        self.profile_stages = set(profile_stages) if isinstance(profile_stages, list) else profile_stages
+        self.profile_dir = context.workspace.path(config.get("profile_dir", "./output/profiles"))
+        self.started_at = datetime.now().isoformat(timespec="seconds")
+        self.started = time.perf_counter()
+        self.stages = []
+        self.running = []
+        self._lock = threading.Lock()
+        self._own_tracemalloc = self.trace_memory and not tracemalloc.is_tracing()
+        if self._own_tracemalloc:
+            tracemalloc.start()
+
+    def _profiled(self, stage):
+        if isinstance(self.profile_stages, set):
+            return stage in self.profile_stages
+        return bool(self.profile_stages)
+
+    def write_progress(self):
+        """Stages done so far and the ones running, for polling a run from outside (with `progress_path`)."""
+        if not self.progress_path:
+            return
+        with self._lock:
+            progress = {
+                "current_stage": self.running[-1] if self.running else None,
+                "running": list(self.running),
+                "stages_done": len(self.stages),
+                "stages_total": len(self.planned) or None,
+                "stages": [{"stage": s["stage"], "status": s["status"], "wall_s": s["wall_s"]} for s in self.stages],
+            }
+            os.makedirs(os.path.dirname(self.progress_path) or ".", exist_ok=True)
+            tmp_path = f"{self.progress_path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(progress, f)
+            os.replace(tmp_path, self.progress_path)
+
+    @contextmanager
+    def stage(self, stage, input_files=()):
+        """Measure the body of the `with` block as pipeline stage `stage`.
+
+        Stages may run in parallel threads: artifacts and io events are
+        attributed through the context's stage scope and CPU time is the
+        stage thread's own plus that of the pool workers it used, while peak
+        RSS and tracemalloc stay process-wide; the workers' peak RSS is
+        reported separately.
+        """
+        entry = {"stage": stage, "status": "ok", "start_s": round(time.perf_counter() - self.started, 4)}
+        with self._lock:
+            self.running.append(stage)
+        self.write_progress()
+        before = self.context.snapshot()
+        rss_before = peak_rss()
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            traced_before = tracemalloc.get_traced_memory()[0]
+        profiler = cProfile.Profile() if self._profiled(stage) else None
+        reset_worker_usage()
+        wall, cpu = time.perf_counter(), time.thread_time()
+        if profiler is not None:
+            profiler.enable()
+
+        try:
+            with self.context.stage_scope(stage):
+                yield entry
+        except Exception as e:
+            entry["status"] = "failed"
+            entry["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            entry["wall_s"] = round(time.perf_counter() - wall, 4)
+            workers = worker_usage()
+            entry["cpu_s"] = round(time.thread_time() - cpu + workers["cpu_s"], 4)
+            if workers["cpu_s"]:
+                entry["worker_cpu_s"] = round(workers["cpu_s"], 4)
+                entry["worker_peak_rss_mb"] = _mb(workers["peak_rss"])
+
+            rss_after = peak_rss()
+            entry["peak_rss_mb"] = _mb(rss_after)
+            entry["peak_rss_delta_mb"] = None if rss_before is None else _mb(rss_after - rss_before)
+            if self.trace_memory:
+                entry["tracemalloc_peak_delta_mb"] = _mb(tracemalloc.get_traced_memory()[1] - traced_before)
+
+            events = [e for e in list(self.context.io_log) if e.get("stage") == stage]
+            reads = [e for e in events if e["event"] == "read"]
+            writes = [e for e in events if e["event"] == "write"]
+            outputs = list(self.context.produced(before, stage).values())
+            entry["artifacts_in"] = len(reads)
+            entry["rows_in"] = sum(e["rows"] for e in reads)
+            entry["cols_in"] = sum(e["cols"] for e in reads)
+            entry["artifacts_out"] = len(outputs)
+            entry["rows_out"] = sum(len(df) for df in outputs)
+            entry["cols_out"] = sum(df.shape[1] for df in outputs)
+            entry["bytes_read"] = sum(_file_size(path) for path in set(input_files)) + sum(e["bytes"] for e in reads)
+            entry["bytes_written"] = sum(e["bytes"] for e in writes)
+            entry["memory_saved_mb"] = _mb(sum(e["bytes"] for e in events if e["event"] == "compact"))
+            overrides = [e for e in events if e["event"] == "override"]
+            if overrides:
+                entry["cells_overridden"] = {e["name"]: e["cells"] for e in overrides}
+            banks = [e for e in events if e["event"] == "kernel_bank"]
+            if banks:
+                entry["kernel_bank"] = {key: banks[-1][key] for key in ("hits", "misses", "size", "maxsize")}
+            inputs = [e for e in events if e["event"] == "input"]
+            if inputs:
+                entry["inputs"] = [
+                    {"file": e["name"], "rows": e["rows"], "cols": e["cols"], "bytes": e["bytes"], "seconds": e.get("seconds")}
+                    for e in inputs
+                ]
+
+            if profiler is not None:
+                os.makedirs(self.profile_dir, exist_ok=True)
+                profile_path = os.path.join(self.profile_dir, f"{stage}.prof")
+                profiler.dump_stats(profile_path)
+                entry["profile"] = profile_path
+
+            with self._lock:
+                self.running.remove(stage)
+                self.stages.append(entry)
+            self.write_progress()
+            logging.info(f"Stage {stage}: {entry['status']} in {entry['wall_s']}s wall, {entry['cpu_s']}s CPU")
+
+    def finish(self, path=None, critical_path=None):
+        """Assemble the report, write it to `path` as JSON and return it."""
+        if self._own_tracemalloc:
+            tracemalloc.stop()
+            self._own_tracemalloc = False
+        report = {
+            "brand": self.brand,
+            "started_at": self.started_at,
+            "wall_s": round(time.perf_counter() - self.started, 4),
+            "cpu_s": round(sum(s["cpu_s"] for s in self.stages), 4),
+            "peak_rss_mb": _mb(peak_rss()),
+            "bytes_read": sum(s["bytes_read"] for s in self.stages),
+            "bytes_written": sum(s["bytes_written"] for s in self.stages),
+            "memory_saved_mb": round(sum(s["memory_saved_mb"] for s in self.stages), 2),
+            "stages": self.stages,
+        }
+        if critical_path is not None:
+            report["critical_path"] = critical_path
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(path, "w") as f:
+                json.dump(report, f, indent=4)
+            logging.info(f"Run report written to {path}")
+        return report
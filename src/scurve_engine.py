@@ -0,0 +1,157 @@
+import os
+import pickle
+import logging
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+HORIZON = 78
+
+
+def scurve_weights(alpha, beta, horizon=HORIZON):
+    """Normalized S-curve weight vectors, one row per (alpha, beta) pair."""
+    alpha = np.asarray(alpha, dtype=float).reshape(-1, 1)
+    beta = np.asarray(beta, dtype=float).reshape(-1, 1)
+    x = np.arange(1, horizon + 1)
+    decay = alpha ** (100 * x / horizon)
+    w_raw = ((100 * decay * np.log(alpha) * beta ** decay) *
+             (np.log(beta) - np.log(10 ** 10))) / (((10 ** 10) ** decay) * horizon)
+    return w_raw / w_raw.sum(axis=1, keepdims=True)
+
+
+class KernelBank:
+    """Bounded LRU cache of normalized S-curve kernels keyed by (alpha, beta, horizon).
+
+    Lag-file parameters are shared by many features and rarely change between
+    runs, so kernels are computed once and, when `path` is set, persisted so
+    later runs and other brands start warm. `hits`/`misses` are kept for tuning
+    `maxsize`.
+    """
+
+    def __init__(self, maxsize=4096, path=None):
+        self.maxsize = maxsize
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._kernels = OrderedDict()
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            self.load(path)
+
+    def get(self, alpha, beta, horizon=HORIZON):
+        key = (float(alpha), float(beta), int(horizon))
+        with self._lock:
+            if key in self._kernels:
+                self._kernels.move_to_end(key)
+                self.hits += 1
+                return self._kernels[key]
+            self.misses += 1
+
+        kernel = scurve_weights([alpha], [beta], horizon)[0]
+        with self._lock:
+            self._kernels[key] = kernel
+            while len(self._kernels) > self.maxsize:
+                self._kernels.popitem(last=False)
+        return kernel
+
+    def weights(self, alpha, beta, horizon=HORIZON):
+        """Stacked kernels for paired alpha/beta sequences, shape (features, horizon)."""
+        if len(alpha) == 0:
+            return np.zeros((0, horizon))
+        return np.vstack([self.get(a, b, horizon) for a, b in zip(alpha, beta)])
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._kernels), "maxsize": self.maxsize}
+
+    def save(self, path=None):
+        path = path or self.path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._lock:
+            kernels = dict(self._kernels)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(kernels, f)
+        os.replace(tmp_path, path)
+        logging.info(f"Saved {len(kernels)} S-curve kernels to {path}")
+
+    def load(self, path):
+        try:
+            with open(path, "rb") as f:
+                kernels = pickle.load(f)
+        except Exception as e:
+            logging.warning(f"Could not load kernel bank from {path}: {e}")
+            return
+        with self._lock:
+            for key, kernel in list(kernels.items())[-self.maxsize:]:
+                self._kernels[key] = kernel
+        logging.info(f"Loaded {len(kernels)} S-curve kernels from {path}")
+
+
+_KERNEL_BANKS = {}
+
+
+def get_kernel_bank(config):
+    """Process-wide kernel bank for the persistence path and size in `config`."""
+    key = (config.get("kernel_bank_path"), config.get("kernel_bank_size", 4096))
+    if key not in _KERNEL_BANKS:
+        _KERNEL_BANKS[key] = KernelBank(maxsize=key[1], path=key[0])
+    return _KERNEL_BANKS[key]
+
+
+def window_correlate(series, kernels, method="direct"):
+    """Banded correlation of each feature's weekly series with its kernel.
+
+    out[t, f] = sum_k kernels[f, k] * series[t + k, f], with the series taken
+    as zero after its last week. This is what the M1 @ M3 Toeplitz product
+    computed, in O(weeks x horizon) work per feature and without the
+    weeks x (weeks + horizon) matrix. `method="fft"` does the same through
+    real FFTs, which is cheaper for long horizons but only exact up to
+    floating-point rounding.
+    """
+    no_of_weeks, no_of_features = series.shape
+    horizon = kernels.shape[1]
+
+    if method == "direct":
+        padded = np.zeros((no_of_weeks + horizon - 1, no_of_features))
+        padded[:no_of_weeks] = series
+        out = np.zeros((no_of_weeks, no_of_features))
+        for k in range(horizon):
+            out += kernels[:, k] * padded[k:k + no_of_weeks]
+        return out
+
+    if method == "fft":
+        size = 1 << int(np.ceil(np.log2(no_of_weeks + horizon - 1)))
+        spectrum = np.fft.rfft(series, n=size, axis=0) * np.fft.rfft(kernels[:, ::-1].T, n=size, axis=0)
+        full = np.fft.irfft(spectrum, n=size, axis=0)
+        return full[horizon - 1:horizon - 1 + no_of_weeks]
+
+    raise ValueError(f"Unknown scurve_method '{method}', expected 'direct' or 'fft'")
+
+
+def expected_roi(aroi, weights, model_start_week_no, method="direct"):
+    """Expected Simple and Weighted ROI for every feature in one pass.
+
+    `aroi` is the (weeks, features) matrix of actual ROI and `weights` the
+    (features, horizon) S-curve kernels. Week t of a feature is the
+    weighted sum of that feature's actual ROI over weeks t .. t+horizon-1,
+    scaled by the share of those weeks that fall inside the model window.
+    """
+    no_of_weeks, no_of_features = aroi.shape
+    horizon = weights.shape[1]
+
+    weighted = window_correlate(aroi, weights, method)
+
+    in_model = np.zeros((no_of_weeks, 1))
+    in_model[model_start_week_no:no_of_weeks] = 1
+    weighted_in_model = window_correlate(np.broadcast_to(in_model, (no_of_weeks, no_of_features)), weights, method)
+
+    t = np.arange(no_of_weeks).reshape(-1, 1)
+    in_model_weeks = np.clip(np.minimum(no_of_weeks, t + horizon) - np.maximum(model_start_week_no, t), 0, None)
+
+    # Windows without any in-model week must divide by an exact zero, as before.
+    weighted_in_model = np.where(in_model_weeks == 0, 0.0, weighted_in_model)
+
+    simple_factor = (horizon + no_of_weeks - 1) / in_model_weeks
+    weighted_factor = 1 / weighted_in_model
+    return weighted * simple_factor, weighted * weighted_factor
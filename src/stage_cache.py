@@ -0,0 +1,96 @@
+import os
+import json
+import hashlib
+import logging
+import pandas as pd
+
+
+def hash_file(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_frame(df):
+    """Content hash of a DataFrame: column names, dtypes and every value."""
+    digest = hashlib.sha256()
+    digest.update(json.dumps([str(c) for c in df.columns]).encode())
+    digest.update(json.dumps([str(t) for t in df.dtypes]).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return digest.hexdigest()
+
+
+def config_subset(config, keys):
+    return json.dumps({k: config.get(k) for k in keys}, sort_keys=True, default=str)
+
+
+def stage_digest(stage, config, config_keys, input_files):
+    """sha256 over a stage's name, its config keys and the content of its raw input files."""
+    digest = hashlib.sha256()
+    digest.update(stage.encode())
+    digest.update(config_subset(config, config_keys).encode())
+    for path in sorted(set(input_files)):
+        file_hash = hash_file(path) if path and os.path.exists(path) else "missing"
+        digest.update(f"{path}:{file_hash}".encode())
+    return digest
+
+
+class StageCache:
+    """Memoizes pipeline stages on a fingerprint of everything they read.
+
+    A stage fingerprint covers the config keys it uses, the content of its raw
+    input files and the content hashes of the artifacts produced by its
+    upstream stages. Because upstream outputs are hashed by content, a stage
+    that reran but produced identical artifacts does not invalidate the
+    stages below it.
+    """
+
+    def __init__(self, cache_dir="./output/stage_cache"):
+        self.cache_dir = cache_dir
+        self.output_hashes = {}
+        self.status = {}
+
+    def fingerprint(self, stage, config, config_keys, input_files, upstream):
+        digest = stage_digest(stage, config, config_keys, input_files)
+        for up in upstream:
+            digest.update(json.dumps(self.output_hashes.get(up, {}), sort_keys=True).encode())
+        return digest.hexdigest()
+
+    def _load(self, stage, fingerprint, context):
+        entry_path = os.path.join(self.cache_dir, stage, f"{fingerprint}.pkl")
+        if not os.path.exists(entry_path):
+            return False
+        entry = pd.read_pickle(entry_path)
+        with context.stage_scope(stage):
+            for name, df in entry["artifacts"].items():
+                context.put(name, df)
+        self.output_hashes[stage] = entry["hashes"]
+        self.status[stage] = "cached"
+        logging.info(f"Stage {stage} unchanged ({fingerprint[:12]}), reused {len(entry['artifacts'])} cached artifacts")
+        return True
+
+    def restore(self, stage, context, config, config_keys=(), input_files=(), upstream=()):
+        """Put the cached artifacts of `stage` into the context without running it; False on a cache miss."""
+        return self._load(stage, self.fingerprint(stage, config, config_keys, input_files, upstream), context)
+
+    def run(self, stage, func, context, config, config_keys=(), input_files=(), upstream=(), reuse=True):
+        """Run `stage` unless its artifacts are cached; `reuse=False` always runs it (for its side effects) and refreshes the entry."""
+        fingerprint = self.fingerprint(stage, config, config_keys, input_files, upstream)
+        if reuse and self._load(stage, fingerprint, context):
+            return None
+
+        before = context.snapshot()
+        with context.stage_scope(stage):
+            result = func()
+        outputs = context.produced(before, stage)
+        hashes = {name: hash_frame(df) for name, df in outputs.items()}
+
+        entry_path = os.path.join(self.cache_dir, stage, f"{fingerprint}.pkl")
+        os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+        pd.to_pickle({"artifacts": outputs, "hashes": hashes}, entry_path)
+        self.output_hashes[stage] = hashes
+        self.status[stage] = "ran"
+        logging.info(f"Stage {stage} ran ({fingerprint[:12]}), cached {len(outputs)} artifacts")
+        return result
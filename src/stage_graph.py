@@ -0,0 +1,146 @@
+import logging
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+class Stage:
+    """One node of the pipeline graph.
+
+    `upstream` are the stages whose artifacts it reads, `config_keys` and
+    `input_files` the config values and raw files it reads (both also key the
+    stage cache), `outputs` the artifacts it hands downstream, each a path or
+    a (workbook path, sheet) pair. A stage that is not `cacheable` writes
+    files nothing else reproduces (a deliverable) and always runs.
+    """
+
+    def __init__(self, name, run, upstream=(), config_keys=(), input_files=(), outputs=(), cacheable=True):
+        self.name = name
+        self.run = run
+        self.upstream = list(upstream)
+        self.config_keys = list(config_keys)
+        self.input_files = [path for path in input_files if path]
+        self.outputs = list(outputs)
+        self.cacheable = cacheable
+
+
+def check_graph(stages):
+    """Raise ValueError on duplicate stage names or an upstream that is not declared before the stage."""
+    seen = set()
+    for stage in stages:
+        if stage.name in seen:
+            raise ValueError(f"Stage {stage.name} is declared twice")
+        missing = [up for up in stage.upstream if up not in seen]
+        if missing:
+            raise ValueError(f"Stage {stage.name} depends on {missing}, which are not declared before it")
+        seen.add(stage.name)
+
+
+def downstream_of(stages, name):
+    """`name` and every stage that depends on it, directly or not."""
+    selected = {name}
+    for stage in stages:
+        if any(up in selected for up in stage.upstream):
+            selected.add(stage.name)
+    return selected
+
+
+def upstream_of(stages, name):
+    """`name` and every stage it depends on, directly or not."""
+    by_name = {stage.name: stage for stage in stages}
+    selected, todo = set(), [name]
+    while todo:
+        current = todo.pop()
+        if current not in selected:
+            selected.add(current)
+            todo.extend(by_name[current].upstream)
+    return selected
+
+
+def select_stages(stages, from_stage=None, until_stage=None):
+    """Names of the stages a partial run executes, in declaration order.
+
+    `from_stage` keeps it and everything downstream of it, `until_stage`
+    keeps it and everything it depends on; both together keep the stages
+    between the two.
+    """
+    names = [stage.name for stage in stages]
+    for name in (from_stage, until_stage):
+        if name is not None and name not in names:
+            raise ValueError(f"Unknown stage {name}, expected one of {names}")
+
+    selected = set(names)
+    if from_stage is not None:
+        selected &= downstream_of(stages, from_stage)
+    if until_stage is not None:
+        selected &= upstream_of(stages, until_stage)
+    if not selected:
+        raise ValueError(f"No stage lies between {from_stage} and {until_stage}")
+    return [name for name in names if name in selected]
+
+
+def run_graph(stages, run_stage, max_workers=1, selected=None):
+    """Call `run_stage(stage)` for every selected stage once all its selected upstream stages succeeded.
+
+    Ready stages start in declaration order on up to `max_workers` threads;
+    with one worker the stages run in the calling thread, in the declared
+    order. The first failure stops new stages from starting; the running
+    ones finish and the error is re-raised. Returns the names of the stages run.
+    """
+    selected = [stage.name for stage in stages] if selected is None else list(selected)
+    pending = [stage for stage in stages if stage.name in selected]
+    if max_workers <= 1:
+        for stage in pending:
+            run_stage(stage)
+        return [stage.name for stage in pending]
+    done = set()
+    futures = {}
+    error = None
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="stage") as pool:
+        while pending or futures:
+            if error is None:
+                for stage in list(pending):
+                    if len(futures) >= max_workers:
+                        break
+                    if all(up in done or up not in selected for up in stage.upstream):
+                        pending.remove(stage)
+                        futures[pool.submit(run_stage, stage)] = stage
+            if not futures:
+                break
+
+            finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage = futures.pop(future)
+                if future.exception() is None:
+                    done.add(stage.name)
+                elif error is None:
+                    error = future.exception()
+                    logging.error(f"Stage {stage.name} failed, not starting {[s.name for s in pending]}")
+
+    if error is not None:
+        raise error
+    return [name for name in selected if name in done]
+
+
+def critical_path(stages, seconds):
+    """Longest chain of dependent stages by `seconds[name]`, as `{"stages": [...], "wall_s": total}`.
+
+    Upstream stages not in `stages` (left out of a partial run) are ignored
+    and stages missing from `seconds` count as zero. This is the lower bound
+    on the wall time however many stages run side by side, so it names the
+    stages worth optimizing.
+    """
+    finish, previous = {}, {}
+    for stage in stages:
+        before = max([up for up in stage.upstream if up in finish], key=lambda up: finish[up], default=None)
+        previous[stage.name] = before
+        finish[stage.name] = (finish[before] if before else 0) + seconds.get(stage.name, 0)
+
+    if not finish:
+        return {"stages": [], "wall_s": 0}
+    name = max(finish, key=finish.get)
+    total = finish[name]
+    path = []
+    while name is not None:
+        path.append(name)
+        name = previous[name]
+    return {"stages": path[::-1], "wall_s": round(total, 4)}
@@ -0,0 +1,86 @@
+import os
+import uuid
+
+INPUT_DIRS = ["Data", "Config", "lagged_files", "raw attribution"]
+OUTPUT_DIRS = ['ensemble_results', 'Extrapolated Data', 'Weekly ROI Format', 'Weighted Cost', 'logs']
+# input folders the stages export intermediates into (mds_*, LTROI weekly workbooks, catalog tables)
+WRITABLE_INPUT_DIRS = ["Data", "raw attribution"]
+
+
+class Workspace:
+    """Root directory of one run; the pipeline's relative `./input` and `./output` paths resolve under it.
+
+    Stages keep addressing files by their historical relative paths (which
+    also name the artifacts in the run context); only the disk access goes
+    through `path`. The default root "." is the current directory, as before.
+    """
+
+    def __init__(self, root=".", run_id=None):
+        self.root = root
+        self.run_id = run_id
+
+    @classmethod
+    def for_run(cls, runs_dir="./runs", run_id=None):
+        """Fresh workspace `{runs_dir}/{run_id}` for one run (a new ID when none is given)."""
+        run_id = run_id or uuid.uuid4().hex[:12]
+        return cls(os.path.join(runs_dir, run_id), run_id)
+
+    def path(self, path):
+        if self.root in (".", "") or not path or os.path.isabs(path):
+            return path
+        return os.path.normpath(os.path.join(self.root, path))
+
+    def link_input(self, input_dir="./input"):
+        """Back the workspace's `input` with a shared input directory, or refresh the links to it.
+
+        Read-only folders (Config, lagged_files, ...) are linked whole. The
+        folders stages write into are the workspace's own, holding one link
+        per shared file; the artifact store replaces a link by a real file
+        before writing it, so a run's exports never land in the shared tree.
+        Calling it again links the shared files added since (uploads) and
+        leaves the workspace's own files alone.
+        """
+        workspace_input = os.path.join(self.root, "input")
+        os.makedirs(self.root, exist_ok=True)
+        if not os.path.isdir(input_dir) or os.path.islink(workspace_input):
+            return self
+        if os.path.isdir(workspace_input) and os.path.samefile(workspace_input, input_dir):
+            return self
+
+        os.makedirs(workspace_input, exist_ok=True)
+        for entry in sorted(os.listdir(input_dir)):
+            source = os.path.abspath(os.path.join(input_dir, entry))
+            target = os.path.join(workspace_input, entry)
+            if entry in WRITABLE_INPUT_DIRS and os.path.isdir(source):
+                os.makedirs(target, exist_ok=True)
+                for name in sorted(os.listdir(source)):
+                    if not os.path.lexists(os.path.join(target, name)):
+                        os.symlink(os.path.join(source, name), os.path.join(target, name))
+            elif not os.path.lexists(target):
+                os.symlink(source, target, target_is_directory=os.path.isdir(source))
+        return self
+
+    def makedirs(self):
+        for folder in INPUT_DIRS:
+            os.makedirs(self.path(f"./input/{folder}"), exist_ok=True)
+        for folder in OUTPUT_DIRS:
+            os.makedirs(self.path(f"./output/{folder}"), exist_ok=True)
+        return self
+
+
+DEFAULT_WORKSPACE = Workspace()
+
+
+def get_workspace(config=None):
+    """Workspace named by `workspace_root` (and `run_id`) in the config, the current directory otherwise.
+
+    With `shared_input_dir` set, the workspace's input links are refreshed so
+    files uploaded there since the workspace was created are found.
+    """
+    if not config or not config.get("workspace_root"):
+        workspace = DEFAULT_WORKSPACE
+    else:
+        workspace = Workspace(config["workspace_root"], config.get("run_id"))
+    if config and config.get("shared_input_dir"):
+        workspace.link_input(config["shared_input_dir"])
+    return workspace